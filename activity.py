@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from preprocessor import DAY_DTYPE, DAY_NAMES, MONTH_DTYPE, MONTH_NAMES, PERIOD_DTYPE, PERIOD_LABELS
+
+
+class ActivityCube:
+    """Dense message counts indexed by (user, day, hour of day), built in one
+    bincount when a chat is loaded. Every timeline, activity map and heatmap
+    is a reduction of one user's (day x hour) plane, and the 'Overall' plane
+    is the sum over users."""
+
+    def __init__(self, dates, codes, n_users):
+        dates = pd.DatetimeIndex(dates)
+        days = dates.normalize()
+        self.start = days.min() if len(days) else pd.Timestamp(0)
+        n_days = (days.max() - self.start).days + 1 if len(days) else 0
+
+        day_offsets = ((days - self.start) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+        flat = (np.asarray(codes, dtype=np.int64) * n_days + day_offsets) * 24 + dates.hour.to_numpy()
+        self.cube = np.bincount(flat, minlength=n_users * n_days * 24).astype(np.int32).reshape(
+            n_users, n_days, 24)
+        self._overall = None
+
+        # Calendar attributes of each day along the cube's day axis
+        self.days = pd.date_range(self.start, periods=n_days, freq='D')
+        self.day_year = self.days.year.to_numpy()
+        self.day_month = self.days.month.to_numpy()
+        self.day_weekday = self.days.dayofweek.to_numpy()
+
+    @classmethod
+    def from_frame(cls, df):
+        # Single-"user" cube for an arbitrary frame (e.g. an already filtered selection)
+        return cls(df['date'], np.zeros(len(df), dtype=np.int64), 1)
+
+    def __sizeof__(self):
+        return self.cube.nbytes + (self._overall.nbytes if self._overall is not None else 0)
+
+    def plane(self, code=None):
+        # (day x hour) counts for one user code, or for everyone when code is None
+        if code is not None:
+            return self.cube[code]
+        if self._overall is None:
+            self._overall = self.cube.sum(axis=0)
+        return self._overall
+
+    def daily(self, plane):
+        per_day = plane.sum(axis=1)
+        active = per_day > 0
+        return pd.DataFrame({'Specific_Date': self.days[active], 'message': per_day[active]})
+
+    def monthly(self, plane):
+        per_day = plane.sum(axis=1)
+        first_year = self.day_year[0] if len(self.days) else 0
+        month_index = (self.day_year - first_year) * 12 + self.day_month - 1
+        per_month = np.bincount(month_index, weights=per_day).astype(np.int64)
+        active = np.flatnonzero(per_month)
+        year = first_year + active // 12
+        month_num = active % 12 + 1
+        timeline = pd.DataFrame({
+            'year': year.astype(np.int16),
+            'month_num': month_num.astype(np.int8),
+            'month': pd.Categorical.from_codes(month_num - 1, dtype=MONTH_DTYPE),
+            'message': per_month[active],
+        })
+        timeline['time'] = MONTH_NAMES[month_num - 1] + '-' + year.astype(str).astype(object)
+        return timeline
+
+    def weekdays(self, plane):
+        counts = np.bincount(self.day_weekday, weights=plane.sum(axis=1), minlength=7).astype(np.int64)
+        return _ranked(counts, DAY_NAMES, DAY_DTYPE, 'day_name')
+
+    def months(self, plane):
+        counts = np.bincount(self.day_month - 1, weights=plane.sum(axis=1), minlength=12).astype(np.int64)
+        return _ranked(counts, MONTH_NAMES, MONTH_DTYPE, 'month')
+
+    def heatmap(self, plane):
+        grid = np.zeros((7, 24), dtype=np.int64)
+        np.add.at(grid, self.day_weekday, plane)
+        return pd.DataFrame(grid, index=pd.CategoricalIndex(DAY_NAMES, dtype=DAY_DTYPE, name='day_name'),
+                            columns=pd.CategoricalIndex(PERIOD_LABELS, dtype=PERIOD_DTYPE, name='period'))
+
+
+def _ranked(counts, labels, dtype, name):
+    # Same shape as Series.value_counts() on a categorical column: every label, busiest first
+    order = np.argsort(-counts, kind='stable')
+    return pd.Series(counts[order], index=pd.CategoricalIndex(labels[order], dtype=dtype), name=name)
@@ -0,0 +1,119 @@
+import os
+import sys
+from collections import Counter
+
+import pandas as pd
+
+from emoji_extract import count_emojis
+from links import count_links
+
+MEDIA_MESSAGE = '<Media omitted>\n'
+NOTIFICATION_USER = 'group_notification'
+
+
+def load_stop_words(path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stop_hinglish.txt')):
+    # Read stop words with error handling
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return frozenset(f.read().split())
+    except OSError:
+        return frozenset()
+
+
+STOP_WORDS = load_stop_words()
+
+
+class TextStats:
+    """Everything the text views need, gathered in one pass over a set of
+    messages: message/word/media/link totals, stopword-filtered word counts
+    (notifications and media excluded) and emoji counts."""
+
+    __slots__ = ('messages', 'words', 'media', 'links', 'word_counts', 'emojis')
+
+    def __init__(self):
+        self.messages = 0
+        self.words = 0
+        self.media = 0
+        self.links = 0
+        self.word_counts = Counter()
+        self.emojis = Counter()
+
+    @classmethod
+    def from_messages(cls, messages, count_words=True, stop_words=STOP_WORDS, links=None):
+        # `links` is the link count when the caller already has it (a ChatIndex extracts once per chat)
+        stats = cls()
+        messages = pd.Series(messages, dtype=object)
+        word_counts = stats.word_counts
+        for message in messages:
+            tokens = message.split()
+            stats.messages += 1
+            stats.words += len(tokens)
+
+            if message == MEDIA_MESSAGE:
+                stats.media += 1
+            elif count_words:
+                word_counts.update(word for word in (token.lower() for token in tokens) if word not in stop_words)
+
+        # Emoji and links are matched column-wise; links only on rows passing a cheap prefilter
+        stats.emojis = count_emojis(messages)
+        stats.links = count_links(messages) if links is None else links
+        return stats
+
+    @classmethod
+    def from_frame(cls, df):
+        # Notification rows count towards totals but never towards word frequencies
+        is_notification = df['user'] == NOTIFICATION_USER
+        stats = cls.from_messages(df.loc[~is_notification, 'message'])
+        if is_notification.any():
+            stats = stats.merge(cls.from_messages(df.loc[is_notification, 'message'], count_words=False))
+        return stats
+
+    def __sizeof__(self):
+        # The counters dominate: their hash tables plus the word and emoji strings they hold
+        return sum(sys.getsizeof(counter) + sum(map(sys.getsizeof, counter))
+                   for counter in (self.word_counts, self.emojis))
+
+    def add(self, other):
+        # Adds `other` into these stats in place; O(size of other), however large these already are
+        self.messages += other.messages
+        self.words += other.words
+        self.media += other.media
+        self.links += other.links
+        self.word_counts.update(other.word_counts)
+        self.emojis.update(other.emojis)
+        return self
+
+    def merge(self, other):
+        return TextStats().add(self).add(other)
+
+
+class TextAggregates:
+    """Per-user TextStats over a ChatIndex. Each user's messages are tokenized
+    once, on first request, and 'Overall' is the merge of every user's stats."""
+
+    def __init__(self, index):
+        self.index = index
+        self._stats = {}
+        # Approximate bytes held by the stats computed so far
+        self.nbytes = 0
+
+    def get(self, selected_user):
+        with self.index.lock:
+            stats = self._stats.get(selected_user)
+            if stats is None:
+                stats = self._compute(selected_user)
+                self._stats[selected_user] = stats
+                size = sys.getsizeof(stats)
+                self.nbytes += size
+                self.index.grew(size)
+            return stats
+
+    def _compute(self, selected_user):
+        if selected_user == 'Overall':
+            stats = TextStats()
+            for user in self.index.users:
+                stats.add(self.get(user))
+            return stats
+        messages = self.index.column(selected_user, 'message')
+        return TextStats.from_messages(messages, count_words=selected_user != NOTIFICATION_USER,
+                                       links=self.index.link_count(selected_user))
@@ -0,0 +1,254 @@
+"""Headless analysis of many WhatsApp exports, one report per chat.
+
+    python batch.py exports/ --out reports/ --workers 4
+    python batch.py "exports/**/*.zip" --out reports/ --parquet
+
+Each export is parsed, scored and run through every helper view in a
+process pool. A chat's report goes to <out>/<chat id>/report.json (plus the
+parsed frame as messages.parquet with --parquet), and <out>/index.json
+summarizes every chat. Finished chats are appended to <out>/progress.jsonl
+as they complete, so an interrupted run picks up where it stopped; a chat
+that fails is recorded as an error and does not stop the others.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import conversation
+import helper
+import ingest
+import preprocessor
+import profiling
+import sentiment
+import snapshot
+from aggregates import NOTIFICATION_USER
+from cache import content_key
+from chat_index import ChatIndex
+
+REPORT_VERSION = 1
+PROGRESS_FILE = 'progress.jsonl'
+INDEX_FILE = 'index.json'
+
+
+def find_exports(targets):
+    # Directories are searched recursively for .txt and .zip exports; anything else is a path or glob
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            for pattern in ('*.txt', '*.zip'):
+                paths.extend(glob.glob(os.path.join(target, '**', pattern), recursive=True))
+        else:
+            paths.extend(glob.glob(target, recursive=True))
+    return sorted(set(os.path.abspath(path) for path in paths if os.path.isfile(path)))
+
+
+def _fingerprint(path):
+    # Cheap change check used to decide whether a finished chat can be skipped
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _chat_id(path, key):
+    stem = re.sub(r'[^\w.-]+', '_', os.path.splitext(os.path.basename(path))[0]).strip('_') or 'chat'
+    return f"{stem}-{key[:12]}"
+
+
+def _table(frame):
+    # Small result frames go into the JSON report as lists of row dicts
+    return json.loads(frame.to_json(orient='records', date_format='iso'))
+
+
+def _counts(series):
+    return {str(label): int(count) for label, count in series.items()}
+
+
+def _pairs(frame):
+    # most_common_words / emoji_helper frames: column 0 is the item, column 1 its count
+    return [[item, int(count)] for item, count in frame.itertuples(index=False)] if not frame.empty else []
+
+
+def _message(text, when):
+    return {'time': when.isoformat() if when is not None else None, 'message': text}
+
+
+def user_report(selected_user, index):
+    messages, words, media, links = helper.fetch_stats(selected_user, index)
+    avg_sentiment, avg_vader_sentiment = helper.sentiment_analysis(selected_user, index)
+    first_msg, first_time, last_msg, last_time = helper.first_last_message_details(selected_user, index)
+    days, hours = helper.get_conversation_duration(first_time, last_time)
+    return {
+        'stats': {'messages': int(messages), 'words': int(words), 'media': int(media), 'links': int(links)},
+        'sentiment': {'textblob': float(avg_sentiment), 'vader': float(avg_vader_sentiment)},
+        'first_message': _message(first_msg, first_time),
+        'last_message': _message(last_msg, last_time),
+        'duration': {'days': days, 'hours': hours},
+        'week_activity': _counts(helper.week_activity_map(selected_user, index)),
+        'month_activity': _counts(helper.month_activity_map(selected_user, index)),
+        'common_words': _pairs(helper.most_common_words(selected_user, index)),
+        'emojis': _pairs(helper.emoji_helper(selected_user, index)),
+    }
+
+
+def build_report(index):
+    """Every helper view for the whole chat, plus the per-user summaries, as
+    a JSON-serializable dict."""
+    report = user_report('Overall', index)
+
+    _, busy = helper.most_busy_users(index)
+    heatmap = helper.activity_heatmap('Overall', index)
+    report.update({
+        'busy_users': dict(zip(busy['Name'].astype(str), busy['Percent'].astype(float))),
+        'link_domains': _counts(helper.link_domains('Overall', index).set_index('Domain')['Links']),
+        'monthly_timeline': _table(helper.monthly_timeline('Overall', index)[['time', 'message']]),
+        'daily_timeline': _table(helper.daily_timeline('Overall', index)),
+        'heatmap': {str(day): _counts(row) for day, row in heatmap.iterrows()},
+        'sentiment_timeline': _table(helper.sentiment_timeline('Overall', index).reset_index()),
+        'sessions': conversation.session_summary('Overall', index),
+        'reply_times': _table(conversation.reply_times('Overall', index)),
+        'gap_distribution': _counts(conversation.gap_distribution('Overall', index)),
+        'users': {str(user): user_report(user, index) for user in index.users if user != NOTIFICATION_USER},
+    })
+    return report
+
+
+def analyze_export(path, out_dir, parquet=False, profile=False):
+    """Parses and analyzes one export and writes its report. Returns the
+    summary line recorded in progress.jsonl; errors are caught and returned
+    as status 'error' so one bad file doesn't take down the batch."""
+    started = time.perf_counter()
+    summary = {'path': path, **_fingerprint(path)}
+    profiling.collect(profile)
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        key = content_key(raw)
+        chat_id = _chat_id(path, key)
+        with ingest.Export(raw) as export:
+            df = preprocessor.preprocess(export.read_text())
+        # Already inside a pool worker, so score in-process instead of starting another pool
+        sentiment.ensure_sentiment(df, workers=1)
+        if not sentiment.has_sentiment(df):
+            raise ValueError("Sentiment scoring failed")
+        index = ChatIndex(df, key=key)
+
+        report = build_report(index)
+        report.update({'version': REPORT_VERSION, 'source': path, 'source_hash': key})
+        if profiling.is_enabled():
+            report['profile'] = profiling.records()
+
+        chat_dir = os.path.join(out_dir, chat_id)
+        os.makedirs(chat_dir, exist_ok=True)
+        with open(os.path.join(chat_dir, 'report.json'), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        if parquet:
+            snapshot.save_snapshot(df, os.path.join(chat_dir, 'messages.parquet'), key)
+
+        summary.update({
+            'status': 'ok',
+            'chat_id': chat_id,
+            'source_hash': key,
+            'messages': report['stats']['messages'],
+            'users': len(report['users']),
+            'first_message': report['first_message']['time'],
+            'last_message': report['last_message']['time'],
+        })
+    except Exception as e:
+        summary.update({'status': 'error', 'error': f"{type(e).__name__}: {e}",
+                        'traceback': traceback.format_exc()})
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def load_progress(out_dir):
+    # Latest recorded outcome per path; a truncated last line from a killed run is ignored
+    progress = {}
+    try:
+        with open(os.path.join(out_dir, PROGRESS_FILE), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                progress[entry['path']] = entry
+    except FileNotFoundError:
+        pass
+    return progress
+
+
+def _is_done(entry, path):
+    return entry is not None and entry['status'] == 'ok' and all(
+        entry.get(field) == value for field, value in _fingerprint(path).items())
+
+
+def run(paths, out_dir, workers=None, parquet=False, resume=True, profile=False):
+    """Analyzes `paths` with at most `workers` processes, skipping chats
+    already finished by an earlier run (unless resume is False), and writes
+    the index summary. Returns the index entries."""
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    progress = load_progress(out_dir) if resume else {}
+    pending = [path for path in paths if not _is_done(progress.get(path), path)]
+    print(f"{len(paths)} exports, {len(paths) - len(pending)} already done, {len(pending)} to analyze")
+
+    with open(os.path.join(out_dir, PROGRESS_FILE), 'a', encoding='utf-8') as log:
+        def record(summary):
+            progress[summary['path']] = summary
+            log.write(json.dumps(summary, ensure_ascii=False) + '\n')
+            log.flush()
+            print(f"[{summary['status']}] {summary['path']} ({summary['seconds']}s)"
+                  + (f": {summary['error']}" if summary['status'] == 'error' else ''))
+
+        if workers <= 1:
+            for path in pending:
+                record(analyze_export(path, out_dir, parquet, profile))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(analyze_export, path, out_dir, parquet, profile): path for path in pending}
+                for future in as_completed(futures):
+                    try:
+                        summary = future.result()
+                    except Exception as e:
+                        # The worker itself died (e.g. killed for memory); only this chat is marked failed
+                        path = futures[future]
+                        summary = {'path': path, **_fingerprint(path), 'status': 'error',
+                                   'error': f"{type(e).__name__}: {e}", 'seconds': None}
+                    record(summary)
+
+    entries = [progress[path] for path in paths if path in progress]
+    index = {
+        'version': REPORT_VERSION,
+        'exports': len(paths),
+        'ok': sum(entry['status'] == 'ok' for entry in entries),
+        'failed': sum(entry['status'] == 'error' for entry in entries),
+        'chats': [{field: value for field, value in entry.items() if field != 'traceback'} for entry in entries],
+    }
+    with open(os.path.join(out_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('targets', nargs='+', help="export files, directories or glob patterns")
+    parser.add_argument('--out', default='reports', help="output directory")
+    parser.add_argument('--workers', type=int, default=None, help="concurrent chats (default: CPU count)")
+    parser.add_argument('--parquet', action='store_true', help="also write each parsed chat as Parquet")
+    parser.add_argument('--no-resume', action='store_true', help="re-analyze chats finished by earlier runs")
+    parser.add_argument('--profile', action='store_true', help="include per-stage timings in each report")
+    args = parser.parse_args()
+
+    paths = find_exports(args.targets)
+    if not paths:
+        parser.error("no exports found")
+    entries = run(paths, args.out, args.workers, args.parquet, not args.no_resume, args.profile)
+    if any(entry['status'] == 'error' for entry in entries):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
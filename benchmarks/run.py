@@ -0,0 +1,161 @@
+"""Timing and peak-memory benchmarks for preprocessing and the helper views.
+
+    python -m benchmarks.run --sizes 10000 100000 --out bench.json
+    python -m benchmarks.run --sizes 10000 --compare bench.json
+
+Each stage is run twice on a deterministic synthetic export: once for wall
+time and once under tracemalloc for peak memory. Results are written as JSON
+so runs from different versions can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import helper
+import preprocessor
+import sentiment
+from benchmarks import synthetic
+from chat_index import ChatIndex
+from formats import detect_format
+
+VIEWS = ['fetch_stats', 'most_common_words', 'emoji_helper', 'create_wordcloud', 'link_domains',
+         'monthly_timeline', 'daily_timeline', 'week_activity_map', 'month_activity_map', 'activity_heatmap',
+         'first_last_message_details', 'most_busy_users', 'sentiment_analysis', 'sentiment_timeline',
+         'sentiment_points']
+# Views that score the frame on first use
+SENTIMENT_VIEWS = {'sentiment_analysis', 'sentiment_timeline', 'sentiment_points'}
+# Views of the whole chat, called without a selected user
+CHAT_VIEWS = {'most_busy_users'}
+# Extra arguments a view needs after (selected_user, df)
+VIEW_ARGS = {'sentiment_points': ('sentiment',)}
+
+
+def measure(fn, memory=True):
+    start, cpu_start = time.perf_counter(), time.process_time()
+    result = fn()
+    seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, {'seconds': round(seconds, 6), 'cpu_seconds': round(cpu_seconds, 6), 'peak_bytes': peak}
+
+
+def call_view(view, selected_user, index):
+    fn = getattr(helper, view)
+    if view in CHAT_VIEWS:
+        return fn(index)
+    return fn(selected_user, index, *VIEW_ARGS.get(view, ()))
+
+
+def bench_chat(size, chat_format, users, memory=True, skip=()):
+    raw = synthetic.generate(size, users=users, chat_format=chat_format).encode('utf-8')
+    rows = []
+
+    def record(stage, fn, needed=False):
+        # A skipped stage is not timed; if later stages need its result it is still computed
+        if stage in skip:
+            return fn() if needed else None
+        result, timing = measure(fn, memory)
+        rows.append(dict(size=size, format=chat_format, stage=stage, **timing))
+        return result
+
+    data = record('decode', lambda: raw.decode('utf-8'), needed=True)
+    fmt = record('detect_format', lambda: detect_format(data), needed=True)
+    messages, dates = record('split', lambda: (fmt.pattern.split(data)[1:], fmt.pattern.findall(data)),
+                             needed=True)
+    df = record('build_frame', lambda: preprocessor._build_frame(messages, dates, fmt), needed=True)
+    record('preprocess', lambda: preprocessor.preprocess(data, fmt))
+    if (os.cpu_count() or 1) > 1:
+        record('preprocess_parallel', lambda: preprocessor._preprocess_parallel(data, fmt, os.cpu_count()))
+    record('iter_preprocess', lambda: preprocessor.concat_frames(
+        list(preprocessor.iter_preprocess(iter([raw]), chat_format=fmt))))
+    views = VIEWS
+    if 'sentiment' in skip:
+        # Nothing is scored, and the views that would score on first use are left out too
+        views = [view for view in VIEWS if view not in SENTIMENT_VIEWS]
+    else:
+        record('sentiment', lambda: sentiment.add_sentiment(df.copy()))
+        sentiment.ensure_sentiment(df)
+    record('chat_index', lambda: ChatIndex(df))
+
+    busiest = df['user'].value_counts().index[0]
+    for view in views:
+        if view in skip:
+            continue
+        for selected_user in ['Overall'] if view in CHAT_VIEWS else ['Overall', busiest]:
+            # A fresh index per view, so each one pays for its own tokenizing/cube building
+            record(f"{view}[{'overall' if selected_user == 'Overall' else 'user'}]",
+                   lambda: call_view(view, selected_user, ChatIndex(df)))
+    return rows
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    key = ['size', 'format', 'stage']
+    merged = pd.DataFrame(current['results']).merge(pd.DataFrame(baseline['results']), on=key,
+                                                     suffixes=('', '_baseline'))
+    merged['time_ratio'] = merged['seconds'] / merged['seconds_baseline']
+    merged['memory_ratio'] = merged['peak_bytes'] / merged['peak_bytes_baseline']
+    columns = key + ['seconds_baseline', 'seconds', 'time_ratio', 'memory_ratio']
+    print(merged[columns].replace([np.inf], np.nan).round(3).to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--formats', nargs='+', default=['android_dmy_12h'],
+                        choices=sorted(synthetic.FORMATS_BY_NAME))
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--skip', nargs='*', default=[], help="stages to leave out of the timings, e.g. sentiment (which also leaves out the sentiment views)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--out', default='bench_output.json')
+    parser.add_argument('--compare', help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for chat_format in args.formats:
+        for size in args.sizes:
+            results.extend(bench_chat(size, chat_format, args.users, not args.no_memory, set(args.skip)))
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        compare(report, args.compare)
+    else:
+        print(pd.DataFrame(results).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Deterministic synthetic WhatsApp exports for benchmarking.
+
+    python -m benchmarks.synthetic out.txt --messages 100000 --format android_dmy_12h
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from formats import FORMATS_BY_NAME
+
+WORDS = ('kal milte hain bhai office ke baad chai peete okay see you at the station tomorrow '
+         'haha nice great thanks please send the notes what time are we meeting yaar done sure').split()
+EMOJIS = ['😂', '❤️', '👍🏽', '🙏', '🔥', '😭', '👨‍👩‍👧', '🇮🇳', '🎉', '😅']
+DOMAINS = ['example.com', 'youtube.com/watch?v=abc', 'maps.google.com', 'news.ycombinator.com', 'github.com/x/y']
+MEDIA_MESSAGE = '<Media omitted>'
+
+
+def header(chat_format, when):
+    stamp = when.strftime(chat_format.date_format)
+    if chat_format.name.startswith('ios'):
+        return f"[{stamp}] "
+    return f"{stamp} - "
+
+
+def generate_lines(messages=10_000, users=8, chat_format='android_dmy_12h', seed=0, multiline=0.05,
+                   emoji_density=0.2, url_density=0.03, media_density=0.04, notification_density=0.005,
+                   start=datetime(2021, 1, 1)):
+    """Yields the lines of a synthetic export. The same arguments always
+    produce the same text, so timings are comparable between versions."""
+    rng = random.Random(seed)
+    chat_format = FORMATS_BY_NAME[chat_format]
+    names = [f"User {i}" for i in range(users)]
+    # A few chatty members and a long tail, like real groups
+    weights = [1 / (i + 1) for i in range(users)]
+    when = start
+
+    for _ in range(messages):
+        when += timedelta(seconds=rng.expovariate(1 / 600))
+        prefix = header(chat_format, when)
+
+        if rng.random() < notification_density:
+            yield f"{prefix}{rng.choice(names)} added {rng.choice(names)}\n"
+            continue
+
+        sender = rng.choices(names, weights)[0]
+        if rng.random() < media_density:
+            yield f"{prefix}{sender}: {MEDIA_MESSAGE}\n"
+            continue
+
+        text = ' '.join(rng.choices(WORDS, k=rng.randint(1, 15)))
+        if rng.random() < emoji_density:
+            text += ' ' + ''.join(rng.choices(EMOJIS, k=rng.randint(1, 3)))
+        if rng.random() < url_density:
+            text += ' https://' + rng.choice(DOMAINS)
+        yield f"{prefix}{sender}: {text}\n"
+
+        if rng.random() < multiline:
+            for _ in range(rng.randint(1, 3)):
+                yield ' '.join(rng.choices(WORDS, k=rng.randint(1, 10))) + '\n'
+
+
+def generate(messages=10_000, **options):
+    return ''.join(generate_lines(messages, **options))
+
+
+def write(path, messages=10_000, **options):
+    # Streams to disk so multi-million message exports never sit in memory
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(generate_lines(messages, **options))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--messages', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--format', default='android_dmy_12h', choices=sorted(FORMATS_BY_NAME))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--multiline', type=float, default=0.05)
+    parser.add_argument('--emoji-density', type=float, default=0.2)
+    parser.add_argument('--url-density', type=float, default=0.03)
+    parser.add_argument('--media-density', type=float, default=0.04)
+    args = parser.parse_args()
+    write(args.path, args.messages, users=args.users, chat_format=args.format, seed=args.seed,
+          multiline=args.multiline, emoji_density=args.emoji_density, url_density=args.url_density,
+          media_density=args.media_density)
+
+
+if __name__ == '__main__':
+    main()
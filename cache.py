@@ -0,0 +1,192 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def content_key(text):
+    # Stable, content-addressed key for a piece of text or raw bytes
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    return hashlib.blake2b(text, digest_size=16).hexdigest()
+
+
+class DiskLRU:
+    """Small persistent key -> bytes store backed by SQLite. Holds at most
+    `max_entries` rows; the least recently used rows are evicted first.
+    Safe to share between threads, and between processes forked after it
+    was created: each process opens its own connection on first use."""
+
+    def __init__(self, path, max_entries=1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _guard(self):
+        # After a fork the inherited lock may be held by a parent thread and the connection
+        # belongs to the parent, so the child starts with its own of both
+        if self._pid != os.getpid():
+            self._pid, self._lock, self._conn = os.getpid(), threading.Lock(), None
+        return self._lock
+
+    def _connection(self):
+        # Called with the lock held; opened on first use in each process
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+            self._conn.commit()
+        return self._conn
+
+    def __len__(self):
+        with self._guard():
+            return self._count(self._connection())
+
+    @staticmethod
+    def _count(conn):
+        return conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        with self._guard():
+            conn = self._connection()
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT key, value FROM entries WHERE key IN ({placeholders})', batch).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                conn.executemany('UPDATE entries SET last_used = ? WHERE key = ?',
+                                 [(now, key) for key in found])
+                conn.commit()
+        return found
+
+    def set_many(self, items):
+        now = time.time()
+        rows = [(key, value, now) for key, value in items]
+        with self._guard():
+            conn = self._connection()
+            conn.executemany('INSERT OR REPLACE INTO entries (key, value, last_used) VALUES (?, ?, ?)', rows)
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        excess = self._count(conn) - self.max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM entries WHERE key IN '
+                '(SELECT key FROM entries ORDER BY last_used LIMIT ?)', (excess,))
+
+    def close(self):
+        with self._guard():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def estimate_size(value):
+    # Rough resident size in bytes, good enough for budgeting cache memory
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class MemoryLRU:
+    """Thread-safe in-process cache bounded by an approximate byte budget.
+    Least recently used entries are dropped once the budget is exceeded; a
+    single value larger than the whole budget is returned but not kept."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def set(self, key, value, size=None):
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+        return value
+
+    def grow(self, key, nbytes):
+        # Adds memory a stored value took on after it was set (e.g. lazily built derived state).
+        # Older entries make room for it, but the growing entry itself is never evicted: it is in use.
+        with self._lock:
+            if key not in self._entries:
+                return
+            value, size = self._entries[key]
+            self._entries[key] = (value, size + nbytes)
+            self._entries.move_to_end(key)
+            self.size += nbytes
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.set(key, compute())
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+# Process-wide caches shared by Streamlit reruns; budgets are in megabytes
+FRAMES = MemoryLRU(int(os.environ.get('CHATFUSION_FRAME_CACHE_MB', 1024)) * 1024 * 1024)
+VIEWS = MemoryLRU(int(os.environ.get('CHATFUSION_VIEW_CACHE_MB', 256)) * 1024 * 1024)
+IMAGES = MemoryLRU(int(os.environ.get('CHATFUSION_IMAGE_CACHE_MB', 128)) * 1024 * 1024)
+# Rendered chart PNGs served by main.py
+FIGURES = MemoryLRU(int(os.environ.get('CHATFUSION_FIGURE_CACHE_MB', 64)) * 1024 * 1024)
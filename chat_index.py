@@ -0,0 +1,168 @@
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+import sentiment
+from activity import ActivityCube
+from aggregates import TextAggregates
+from conversation import Timeline
+from links import link_table
+
+
+class ChatIndex:
+    """Per-user row index over a preprocessed chat, built once after parsing.
+
+    Rows are grouped by user with a stable argsort, so each user's messages
+    occupy one contiguous, still chronological, slice of `order` given by
+    `offsets`. Selecting a user takes just those row positions rather than
+    scanning the whole frame, and the 'Overall' selection is the frame itself."""
+
+    def __init__(self, df, key=None):
+        self.df = df
+        # Content hash of the source export when known; used by derived caches
+        self.key = key
+
+        codes, users = pd.factorize(df['user'], sort=True)
+        self.codes = codes
+        self.users = list(users)
+        self._positions = {user: i for i, user in enumerate(self.users)}
+        self.order = np.argsort(codes, kind='stable')
+        self.counts = np.bincount(codes, minlength=len(self.users))
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)])
+        # Tokenized text statistics, filled per user on first use
+        self.text = TextAggregates(self)
+        self._activity = None
+        self._links = None
+        self._timeline = None
+        # Guards the lazily built state above so concurrent views build each piece once;
+        # reentrant because the Overall text stats are summed from the per-user ones
+        self.lock = threading.RLock()
+        self._sentiment_lock = threading.Lock()
+        # Called with the byte size of derived state as it is added, so a cache holding the
+        # index can keep its accounting current (see cache.MemoryLRU.grow)
+        self.on_grow = None
+
+    def __len__(self):
+        return len(self.df)
+
+    def __sizeof__(self):
+        size = self.df.memory_usage(deep=True).sum() + self.order.nbytes + self.offsets.nbytes + self.codes.nbytes
+        if self._activity is not None:
+            size += sys.getsizeof(self._activity)
+        if self._links is not None:
+            size += self._links.memory_usage(deep=True).sum()
+        if self._timeline is not None:
+            size += sys.getsizeof(self._timeline)
+        return int(size) + self.text.nbytes + sys.getsizeof(self.users)
+
+    def grew(self, nbytes):
+        if self.on_grow is not None and nbytes:
+            self.on_grow(nbytes)
+
+    @property
+    def columns(self):
+        return self.df.columns
+
+    @property
+    def activity(self):
+        # (user x day x hour) message counts behind every timeline and heatmap view
+        with self.lock:
+            if self._activity is None:
+                self._activity = ActivityCube(self.df['date'], self.codes, len(self.users))
+                self.grew(sys.getsizeof(self._activity))
+            return self._activity
+
+    @property
+    def links(self):
+        # Every link in the chat with its sender and domain (see links.link_table), extracted once
+        with self.lock:
+            if self._links is None:
+                self._links = link_table(self.df)
+                self.grew(int(self._links.memory_usage(deep=True).sum()))
+            return self._links
+
+    @property
+    def timeline(self):
+        # Sorted timestamps, sender codes and gaps behind the conversation views (see conversation.Timeline)
+        with self.lock:
+            if self._timeline is None:
+                self._timeline = Timeline.from_index(self)
+                self.grew(sys.getsizeof(self._timeline))
+            return self._timeline
+
+    def link_rows(self, selected_user):
+        if selected_user == 'Overall':
+            return self.links
+        return self.links[self.links['user'] == selected_user]
+
+    def link_count(self, selected_user):
+        if selected_user == 'Overall':
+            return len(self.links)
+        return int((self.links['user'] == selected_user).sum())
+
+    def ensure_sentiment(self, workers=None):
+        # Scores the frame on first use (see sentiment.ensure_sentiment) and accounts for the new columns.
+        # The columns go onto a shallow copy that replaces self.df in one assignment, so views
+        # reading the frame meanwhile never see it half-scored
+        with self._sentiment_lock:
+            df = self.df
+            if not sentiment.has_sentiment(df):
+                scored = sentiment.ensure_sentiment(df.copy(deep=False), workers)
+                self.df = scored
+                self.grew(int(scored.memory_usage(index=False).sum() - df.memory_usage(index=False).sum()))
+            return self.df
+
+    def code(self, user):
+        # Position of the user along the activity cube's first axis (None if unknown)
+        return self._positions.get(user)
+
+    def _slice(self, user):
+        i = self._positions.get(user)
+        if i is None:
+            return 0, 0
+        return self.offsets[i], self.offsets[i + 1]
+
+    def positions(self, user):
+        # Row positions in self.df for `user`, in chronological order
+        start, stop = self._slice(user)
+        return self.order[start:stop]
+
+    def count(self, user):
+        start, stop = self._slice(user)
+        return int(stop - start)
+
+    def frame(self, selected_user):
+        """Rows of `selected_user` ('Overall' for the whole chat), taken by
+        position in O(rows of that user) without scanning other users."""
+        if selected_user == 'Overall':
+            return self.df
+        return self.df.take(self.positions(selected_user))
+
+    def column(self, selected_user, name):
+        # One column of frame(), without copying the others
+        if selected_user == 'Overall':
+            return self.df[name]
+        return self.df[name].take(self.positions(selected_user))
+
+    def first_row(self, selected_user):
+        if selected_user == 'Overall':
+            return self.df.iloc[0] if len(self.df) else None
+        positions = self.positions(selected_user)
+        return self.df.iloc[positions[0]] if len(positions) else None
+
+    def last_row(self, selected_user):
+        if selected_user == 'Overall':
+            return self.df.iloc[-1] if len(self.df) else None
+        positions = self.positions(selected_user)
+        return self.df.iloc[positions[-1]] if len(positions) else None
+
+    def message_counts(self):
+        # Messages per user, most active first (same shape as value_counts())
+        return pd.Series(self.counts, index=self.users, name='user').sort_values(ascending=False, kind='stable')
+
+
+def as_index(df):
+    # Helpers accept either a preprocessed DataFrame or a ChatIndex built from one
+    return df if isinstance(df, ChatIndex) else ChatIndex(df)
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from aggregates import NOTIFICATION_USER
+
+# A silence longer than this ends a conversation session; a message after it is not a reply
+DEFAULT_IDLE_MINUTES = 30
+
+# Upper edges (minutes) of the inter-message gap histogram; the last bucket is open-ended
+GAP_BUCKETS = [1, 5, 30, 120, 1440]
+GAP_LABELS = ['< 1 min', '1-5 min', '5-30 min', '30 min-2 h', '2 h-1 day', '> 1 day']
+
+_NS_PER_MINUTE = 60 * 10 ** 9
+
+
+class Timeline:
+    """The chat's messages (notifications left out) as chronologically
+    sorted nanosecond timestamps and sender codes, with the gap before each
+    message. Everything below is a diff, comparison or cumulative sum over
+    these arrays, so it stays linear in the number of messages."""
+
+    def __init__(self, dates, codes, users):
+        dates = np.asarray(dates, dtype='datetime64[ns]').view(np.int64)
+        codes = np.asarray(codes)
+        # Exports are chronological already; only sort if clock changes put a message out of order
+        if len(dates) > 1 and (np.diff(dates) < 0).any():
+            order = np.argsort(dates, kind='stable')
+            dates, codes = dates[order], codes[order]
+        self.dates = dates
+        self.codes = codes
+        self.users = np.asarray(users, dtype=object)
+        # gaps[i] is the time (minutes) between message i and the one before it; NaN for the first
+        self.gaps = np.concatenate([[np.nan], np.diff(dates) / _NS_PER_MINUTE])[:len(dates)]
+
+    @classmethod
+    def from_frame(cls, df):
+        frame = df.loc[df['user'] != NOTIFICATION_USER, ['date', 'user']]
+        codes, users = pd.factorize(frame['user'].astype(str))
+        return cls(frame['date'].to_numpy(), codes, users)
+
+    @classmethod
+    def from_index(cls, index):
+        # Reuses the index's sender codes; notifications are masked out rather than refactorized
+        keep = index.codes != index.code(NOTIFICATION_USER)
+        return cls(index.df['date'].to_numpy()[keep], index.codes[keep], index.users)
+
+    def __sizeof__(self):
+        return self.dates.nbytes + self.codes.nbytes + self.gaps.nbytes + self.users.nbytes
+
+    def __len__(self):
+        return len(self.dates)
+
+    def code(self, user):
+        matches = np.flatnonzero(self.users == user)
+        return matches[0] if len(matches) else None
+
+    def rows(self, selected_user):
+        # Boolean mask of the selected user's messages (all of them for 'Overall')
+        if selected_user == 'Overall':
+            return np.ones(len(self), dtype=bool)
+        code = self.code(selected_user)
+        return self.codes == code if code is not None else np.zeros(len(self), dtype=bool)
+
+    def replies(self, idle_minutes=DEFAULT_IDLE_MINUTES):
+        # Messages answering someone else within the idle threshold
+        changed = np.concatenate([[False], self.codes[1:] != self.codes[:-1]])
+        return changed & (self.gaps <= idle_minutes)
+
+    def session_ids(self, idle_minutes=DEFAULT_IDLE_MINUTES):
+        # Session number of every message: a new one starts after each idle gap
+        return np.cumsum(~(self.gaps <= idle_minutes)) - 1
+
+
+def _timeline(df):
+    # A ChatIndex builds its timeline once and shares it across views; a bare DataFrame builds one on the spot
+    return Timeline.from_frame(df) if isinstance(df, pd.DataFrame) else df.timeline
+
+
+def gap_distribution(selected_user, df):
+    """How long the chat was quiet before each message (before each of
+    `selected_user`'s messages), bucketed into GAP_LABELS."""
+    timeline = _timeline(df)
+    gaps = timeline.gaps[timeline.rows(selected_user)]
+    gaps = gaps[~np.isnan(gaps)]
+    counts = np.bincount(np.searchsorted(GAP_BUCKETS, gaps, side='right'), minlength=len(GAP_LABELS))
+    return pd.Series(counts, index=pd.Index(GAP_LABELS, name='gap'), name='messages')
+
+
+def reply_times(selected_user, df, idle_minutes=DEFAULT_IDLE_MINUTES):
+    """Per-user reply latency: for every message that follows a message from
+    a different user within `idle_minutes`, the time since that message.
+    Returns replies, median, mean and 90th percentile (minutes) per user,
+    fastest first; only `selected_user`'s row unless it is 'Overall'."""
+    timeline = _timeline(df)
+    is_reply = timeline.replies(idle_minutes) & timeline.rows(selected_user)
+    latency = pd.Series(timeline.gaps[is_reply])
+    grouped = latency.groupby(timeline.users[timeline.codes[is_reply]])
+    table = pd.DataFrame({
+        'replies': grouped.size(),
+        'median_minutes': grouped.median(),
+        'mean_minutes': grouped.mean(),
+        'p90_minutes': grouped.quantile(0.9),
+    })
+    table.index.name = 'user'
+    return table.sort_values('median_minutes', kind='stable').round(2).reset_index()
+
+
+def conversation_sessions(selected_user, df, idle_minutes=DEFAULT_IDLE_MINUTES):
+    """One row per conversation session (messages separated by at most
+    `idle_minutes`): start, end, duration, message count, number of
+    participants and who started it. With a user selected, only the
+    sessions they took part in."""
+    timeline = _timeline(df)
+    n = len(timeline)
+    session = timeline.session_ids(idle_minutes)
+    starts = np.flatnonzero(~(timeline.gaps <= idle_minutes))
+    ends = np.concatenate([starts[1:], [n]]) - 1 if n else starts
+
+    # Distinct (session, user) pairs, found by hashing, give each session's participant count
+    width = max(len(timeline.users), 1)
+    pairs = pd.unique(session * width + timeline.codes)
+    participants = np.bincount(pairs // width, minlength=len(starts))
+
+    table = pd.DataFrame({
+        'start': pd.to_datetime(timeline.dates[starts]),
+        'end': pd.to_datetime(timeline.dates[ends]),
+        'duration_minutes': ((timeline.dates[ends] - timeline.dates[starts]) / _NS_PER_MINUTE).round(2),
+        'messages': ends - starts + 1,
+        'participants': participants,
+        'started_by': timeline.users[timeline.codes[starts]],
+    })
+    if selected_user != 'Overall':
+        table = table.iloc[np.unique(session[timeline.rows(selected_user)])].reset_index(drop=True)
+    return table
+
+
+def session_summary(selected_user, df, idle_minutes=DEFAULT_IDLE_MINUTES):
+    """Headline session statistics: session count, median duration, average
+    messages and participants per session, and how many sessions the
+    selected user started (all of them for 'Overall')."""
+    sessions = conversation_sessions(selected_user, df, idle_minutes)
+    if sessions.empty:
+        return {'sessions': 0, 'median_minutes': 0.0, 'mean_messages': 0.0, 'mean_participants': 0.0,
+                'started': 0}
+    started = len(sessions) if selected_user == 'Overall' else int((sessions['started_by'] == selected_user).sum())
+    return {
+        'sessions': len(sessions),
+        'median_minutes': float(sessions['duration_minutes'].median()),
+        'mean_messages': round(float(sessions['messages'].mean()), 2),
+        'mean_participants': round(float(sessions['participants'].mean()), 2),
+        'started': started,
+    }
@@ -0,0 +1,74 @@
+import itertools
+import re
+from collections import Counter
+
+import emoji
+import pandas as pd
+
+# Every emoji sequence contains at least one non-ASCII code point, so plain ASCII rows can be skipped
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+
+def _char_class(chars):
+    # Collapse runs of consecutive code points into ranges; long literal lists are slow to test
+    codes = sorted(ord(char) for char in chars)
+    ranges = []
+    for code in codes:
+        if ranges and code == ranges[-1][1] + 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+        return re.escape(chr(ranges[0][0]))
+    return '[' + ''.join(re.escape(chr(lo)) if lo == hi else re.escape(chr(lo)) + '-' + re.escape(chr(hi))
+                         for lo, hi in ranges) + ']'
+
+
+def _trie_pattern(node):
+    # node maps a character to its child node; the None key marks "a sequence ends here"
+    alternatives, leaves = [], []
+    for char in sorted(key for key in node if key is not None):
+        child = node[char]
+        if list(child) == [None]:
+            leaves.append(char)
+        else:
+            alternatives.append(re.escape(char) + _trie_pattern(child))
+    if leaves:
+        alternatives.append(_char_class(leaves))
+
+    pattern = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+    if None in node:
+        # Greedy optional suffix: prefer the longer sequence, fall back to the shorter one
+        pattern = '(?:' + pattern + ')?'
+    return pattern
+
+
+def build_emoji_pattern(sequences=None):
+    """Compiles every emoji sequence known to the `emoji` package into one
+    trie-shaped regex. ZWJ sequences, skin-tone variants, keycaps and flags
+    are matched whole, always preferring the longest sequence."""
+    trie = {}
+    for sequence in (emoji.EMOJI_DATA if sequences is None else sequences):
+        node = trie
+        for char in sequence:
+            node = node.setdefault(char, {})
+        node[None] = True
+    trie_keys = [key for key in trie if key is not None]
+    # The lookahead rejects positions that can't start an emoji before any alternative is tried
+    return re.compile('(?=' + _char_class(trie_keys) + ')' + _trie_pattern(trie))
+
+
+EMOJI_PATTERN = build_emoji_pattern()
+
+
+def extract_emojis(text):
+    if not _NON_ASCII.search(text):
+        return []
+    return EMOJI_PATTERN.findall(text)
+
+
+def count_emojis(messages):
+    # Column-wise path: drop ASCII-only rows first, then findall over the remainder
+    messages = pd.Series(messages, dtype=object)
+    candidates = messages[messages.str.contains(_NON_ASCII, na=False)]
+    return Counter(itertools.chain.from_iterable(candidates.str.findall(EMOJI_PATTERN)))
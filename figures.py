@@ -0,0 +1,28 @@
+import io
+import os
+
+import matplotlib.pyplot as plt
+
+import cache
+
+# Resolution charts are rasterized at (what st.pyplot used)
+FIGURE_DPI = int(os.environ.get('CHATFUSION_FIGURE_DPI', 200))
+
+
+def render_png(fig, dpi=FIGURE_DPI):
+    # PNG bytes of `fig`; the figure is closed afterwards, even if saving fails
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+def cached_png(key, draw, dpi=FIGURE_DPI, keep=True):
+    """PNG of the chart `draw()` builds, rendered once per `key` and kept in
+    cache.FIGURES; `draw` only runs on a miss. With keep=False (a chart of
+    data that may still change) it is rendered every time and not stored."""
+    if not keep:
+        return render_png(draw(), dpi)
+    return cache.FIGURES.get_or_compute(key + (dpi,), lambda: render_png(draw(), dpi))
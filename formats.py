@@ -0,0 +1,123 @@
+import re
+from collections import namedtuple
+from datetime import datetime
+
+# How many characters of the export are inspected when guessing its format
+PROBE_SIZE = 8192
+
+# A WhatsApp line format: `pattern` matches a message header (timestamp plus
+# separator) at the start of a line and `date_format` parses the normalized
+# timestamp exactly. Anchoring the header keeps a timestamp quoted inside a
+# message body from starting a new message, on every parse path alike.
+ChatFormat = namedtuple('ChatFormat', ['name', 'pattern', 'date_format'])
+
+# (name, header template, strptime joiner)
+_LINE_STYLES = [
+    ('android', r'{date},\s{time}\s-\s', '{date}, {time}'),
+    ('ios', r'\u200e?\[{date},\s{time}\]\s', '{date}, {time}'),
+]
+
+_TIME_STYLES = [
+    ('12h', r'\d{1,2}:\d{2}\s[APap][Mm]', '%I:%M %p'),
+    ('12h_seconds', r'\d{1,2}:\d{2}:\d{2}\s[APap][Mm]', '%I:%M:%S %p'),
+    ('24h', r'\d{1,2}:\d{2}', '%H:%M'),
+    ('24h_seconds', r'\d{1,2}:\d{2}:\d{2}', '%H:%M:%S'),
+]
+
+# Day-first comes before month-first so exports that never settle the order keep the old behaviour
+_DATE_STYLES = [
+    ('dmy', r'\d{1,2}{sep}\d{1,2}{sep}\d{2}(?!\d)', '%d{sep}%m{sep}%y'),
+    ('dmy4', r'\d{1,2}{sep}\d{1,2}{sep}\d{4}', '%d{sep}%m{sep}%Y'),
+    ('mdy', r'\d{1,2}{sep}\d{1,2}{sep}\d{2}(?!\d)', '%m{sep}%d{sep}%y'),
+    ('mdy4', r'\d{1,2}{sep}\d{1,2}{sep}\d{4}', '%m{sep}%d{sep}%Y'),
+]
+
+_DATE_SEPARATORS = [('', '/'), ('dot', '.')]
+
+
+def _build_registry():
+    formats = []
+    for line_name, line_template, joiner in _LINE_STYLES:
+        for date_name, date_pattern, date_format in _DATE_STYLES:
+            for sep_name, sep in _DATE_SEPARATORS:
+                for time_name, time_pattern, time_format in _TIME_STYLES:
+                    pattern = line_template.format(
+                        date=date_pattern.replace('{sep}', re.escape(sep)), time=time_pattern)
+                    name = '_'.join(filter(None, [line_name, date_name, sep_name, time_name]))
+                    formats.append(ChatFormat(
+                        name, re.compile('^' + pattern, re.M),
+                        joiner.format(date=date_format.replace('{sep}', sep), time=time_format)))
+    return formats
+
+
+FORMATS = _build_registry()
+FORMATS_BY_NAME = {chat_format.name: chat_format for chat_format in FORMATS}
+
+
+def normalize_stamp(header):
+    # Turn a matched header into the bare timestamp that date_format expects
+    return header.replace('\u202f', ' ').replace('\u00a0', ' ').strip(' -[]\u200e')
+
+
+def _score(chat_format, lines):
+    score = 0
+    for line in lines:
+        match = chat_format.pattern.match(line)
+        if not match:
+            continue
+        try:
+            datetime.strptime(normalize_stamp(match.group(0)), chat_format.date_format)
+        except ValueError:
+            continue
+        score += 1
+    return score
+
+
+# The day and month fields of a header, whatever the separator and line style
+_DATE_FIELDS = re.compile(r'(\d{1,2})\D(\d{1,2})\D')
+
+
+def order_counterpart(chat_format):
+    # The same format with day and month swapped, or None for formats without a day/month order
+    for own, other in (('_dmy', '_mdy'), ('_mdy', '_dmy')):
+        if own in chat_format.name:
+            return FORMATS_BY_NAME[chat_format.name.replace(own, other, 1)]
+    return None
+
+
+def settle_order(chat_format, text):
+    """The day-first or month-first variant of `chat_format`, whichever the
+    first header in `text` with a field above 12 proves. None when no
+    header in `text` settles it (every day so far was 12 or less)."""
+    other = order_counterpart(chat_format)
+    if other is None:
+        return chat_format
+    day_first = chat_format if '_dmy' in chat_format.name else other
+    month_first = other if day_first is chat_format else chat_format
+    for match in chat_format.pattern.finditer(text):
+        first, second = map(int, _DATE_FIELDS.search(match.group(0)).groups())
+        if first > 12:
+            return day_first
+        if second > 12:
+            return month_first
+    return None
+
+
+def detect_format(text):
+    """Picks the registered format whose header matches, and whose timestamp
+    parses, on the most lines of the first PROBE_SIZE characters of `text`.
+    If the probe fits day-first and month-first equally (no day above 12
+    yet), the rest of `text` is scanned until a date settles the order;
+    day-first is kept if none does. Raises ValueError if nothing matches."""
+    lines = text[:PROBE_SIZE].splitlines()
+    best, best_score = None, 0
+    for chat_format in FORMATS:
+        score = _score(chat_format, lines)
+        if score > best_score:
+            best, best_score = chat_format, score
+    if best is None:
+        raise ValueError("Unrecognised WhatsApp export format")
+    other = order_counterpart(best)
+    if other is not None and _score(other, lines) == best_score:
+        best = settle_order(best, text) or best
+    return best
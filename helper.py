@@ -1,226 +1,210 @@
-from urlextract import URLExtract
 from wordcloud import WordCloud
+import numpy as np
 import pandas as pd
-from collections import Counter
-import emoji
+import sentiment
+import links
+import cache
+import timeseries
+from activity import ActivityCube
+from aggregates import TextStats
+from chat_index import ChatIndex
+
+# Only the most frequent words are laid out; the long tail is invisible anyway
+WORDCLOUD_MAX_WORDS = 200
+
+
+def _select(selected_user, df):
+    # Rows of selected_user; a ChatIndex answers with a slice instead of scanning the whole frame
+    if isinstance(df, ChatIndex):
+        return df.frame(selected_user)
+    if selected_user != 'Overall':
+        return df[df['user'] == selected_user]
+    return df
+
+
+def _ensure_sentiment(df):
+    # Scores are computed on first use and kept on the frame; a ChatIndex also accounts for them
+    if isinstance(df, ChatIndex):
+        df.ensure_sentiment()
+    else:
+        sentiment.ensure_sentiment(df)
 
-extract = URLExtract()
+
+def _text_stats(selected_user, df):
+    # A ChatIndex tokenizes each user once and reuses it; a bare DataFrame is tokenized on the spot
+    if isinstance(df, ChatIndex):
+        return df.text.get(selected_user)
+    return TextStats.from_frame(_select(selected_user, df))
 
 
 def fetch_stats(selected_user, df):
     # Input validation
-    if not isinstance(df, pd.DataFrame):
-        raise ValueError("Input must be a pandas DataFrame")
+    if not isinstance(df, (pd.DataFrame, ChatIndex)):
+        raise ValueError("Input must be a pandas DataFrame or ChatIndex")
     if not all(col in df.columns for col in ['user', 'message']):
         raise ValueError("DataFrame missing required columns 'user' or 'message'")
 
-    # Ensure string type
-    df = df.copy()
-    df['message'] = df['message'].astype(str)
-    df['user'] = df['user'].astype(str)
+    stats = _text_stats(selected_user, df)
 
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+    return stats.messages, stats.words, stats.media, stats.links
 
-    num_messages = df.shape[0]
-    words = []
-    for message in df['message']:
-        words.extend(message.split())
 
-    # Fetching number of media messages
-    num_media_messages = df[df['message'] == '<Media omitted>\n'].shape[0]
+def link_domains(selected_user, df):
+    # Input validation
+    if not isinstance(df, (pd.DataFrame, ChatIndex)):
+        raise ValueError("Input must be a pandas DataFrame or ChatIndex")
+    if not all(col in df.columns for col in ['user', 'message']):
+        raise ValueError("DataFrame missing required columns 'user' or 'message'")
 
-    # Fetch all the links shared
-    links = []
-    for message in df['message']:
-        try:
-            links.extend(extract.find_urls(message))
-        except:
-            continue  # Skip if URL extraction fails
+    # A ChatIndex extracts the chat's links once and shares them with fetch_stats
+    table = df.link_rows(selected_user) if isinstance(df, ChatIndex) else links.link_table(_select(selected_user, df))
 
-    return num_messages, len(words), num_media_messages, len(links)
+    return table['domain'].value_counts().rename_axis('Domain').reset_index(name='Links')
 
 
 def most_busy_users(df):
     # Input validation
-    if not isinstance(df, pd.DataFrame):
-        raise ValueError("Input must be a pandas DataFrame")
+    if not isinstance(df, (pd.DataFrame, ChatIndex)):
+        raise ValueError("Input must be a pandas DataFrame or ChatIndex")
     if 'user' not in df.columns:
         raise ValueError("DataFrame missing required column 'user'")
 
-    df['user'] = df['user'].astype(str)
-    x = df['user'].value_counts().head()
-    busy_df = round((df['user'].value_counts() / df.shape[0]) * 100, 2).reset_index().rename(
+    counts = df.message_counts() if isinstance(df, ChatIndex) else df['user'].value_counts()
+    x = counts.head()
+    busy_df = round((counts / len(df)) * 100, 2).reset_index().rename(
         columns={'index': 'Name', 'user': 'Percent'})
     return x, busy_df
 
 
-def create_wordcloud(selected_user, df):
+def create_wordcloud(selected_user, df, max_words=WORDCLOUD_MAX_WORDS, width=500, height=500):
+    """Renders the word cloud of the top `max_words` stopword-filtered words
+    and returns it as an RGB image array (None when there are no words).
+    With a keyed ChatIndex the image is cached per (chat, user, options)."""
     # Input validation and type safety
-    if not isinstance(df, pd.DataFrame):
-        raise ValueError("Input must be a pandas DataFrame")
+    if not isinstance(df, (pd.DataFrame, ChatIndex)):
+        raise ValueError("Input must be a pandas DataFrame or ChatIndex")
     if not all(col in df.columns for col in ['user', 'message']):
         raise ValueError("DataFrame missing required columns")
 
-    df = df.copy()
-    df['message'] = df['message'].astype(str)
-    df['user'] = df['user'].astype(str)
-
-    # Filter data
-    df = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')]
+    cache_key = None
+    if isinstance(df, ChatIndex) and df.key is not None:
+        cache_key = ('wordcloud', df.key, selected_user, max_words, width, height)
+        image = cache.IMAGES.get(cache_key)
+        if image is not None:
+            return image
 
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-
-    # Read stop words with error handling
-    try:
-        with open('stop_hinglish.txt', 'r', encoding='utf-8') as f:
-            stop_words = set(f.read().split())
-    except:
-        stop_words = set()
-
-    # Process messages
-    df['message'] = df['message'].apply(
-        lambda msg: " ".join([word for word in str(msg).lower().split() if word not in stop_words])
-    )
+    # Stopword-filtered frequencies, without notifications and media
+    frequencies = dict(_text_stats(selected_user, df).word_counts.most_common(max_words))
 
-    messages_text = df['message'].str.cat(sep=" ")
-
-    if not messages_text.strip():
+    if not frequencies:
         return None
 
     # Generate WordCloud
     try:
-        wc = WordCloud(width=500, height=500, min_font_size=10, background_color='white')
-        return wc.generate(messages_text)
+        wc = WordCloud(width=width, height=height, min_font_size=10, background_color='white',
+                       max_words=max_words)
+        image = wc.generate_from_frequencies(frequencies).to_array()
     except:
         return None
 
+    if cache_key is not None:
+        cache.IMAGES.set(cache_key, image)
+    return image
+
 
 def most_common_words(selected_user, df):
     # Input validation
-    if not isinstance(df, pd.DataFrame):
-        raise ValueError("Input must be a pandas DataFrame")
+    if not isinstance(df, (pd.DataFrame, ChatIndex)):
+        raise ValueError("Input must be a pandas DataFrame or ChatIndex")
     if not all(col in df.columns for col in ['user', 'message']):
         raise ValueError("DataFrame missing required columns")
 
-    df = df.copy()
-    df['message'] = df['message'].astype(str)
-    df['user'] = df['user'].astype(str)
-
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-
-    df = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')]
-
-    # Read stop words with error handling
-    try:
-        with open('stop_hinglish.txt', 'r', encoding='utf-8') as f:
-            stop_words = set(f.read().split())
-    except:
-        stop_words = set()
-
-    words = []
-    for message in df['message']:
-        words.extend([word for word in str(message).lower().split() if word not in stop_words])
-
-    return pd.DataFrame(Counter(words).most_common(20))
+    return pd.DataFrame(_text_stats(selected_user, df).word_counts.most_common(20))
 
 
 def emoji_helper(selected_user, df):
     # Input validation
-    if not isinstance(df, pd.DataFrame):
-        raise ValueError("Input must be a pandas DataFrame")
+    if not isinstance(df, (pd.DataFrame, ChatIndex)):
+        raise ValueError("Input must be a pandas DataFrame or ChatIndex")
     if 'message' not in df.columns:
         raise ValueError("DataFrame missing required column 'message'")
 
-    df = df.copy()
-    df['message'] = df['message'].astype(str)
-
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-
-    emojis = []
-    for message in df['message']:
-        try:
-            emojis.extend([c for c in str(message) if emoji.is_emoji(c)])
-        except:
-            continue
+    emojis = _text_stats(selected_user, df).emojis
 
     if not emojis:
         return pd.DataFrame()
 
-    return pd.DataFrame(Counter(emojis).most_common(len(Counter(emojis))))
+    return pd.DataFrame(emojis.most_common())
+
+
+def _activity(selected_user, df):
+    # A ChatIndex serves every activity view from its precomputed count cube
+    if isinstance(df, ChatIndex):
+        cube = df.activity
+        if selected_user == 'Overall':
+            return cube, cube.plane()
+        code = df.code(selected_user)
+        if code is None:
+            return cube, np.zeros(cube.cube.shape[1:], dtype=cube.cube.dtype)
+        return cube, cube.plane(code)
+    cube = ActivityCube.from_frame(_select(selected_user, df))
+    return cube, cube.plane(0)
 
 
 def monthly_timeline(selected_user, df):
     # Input validation
-    required_cols = ['user', 'message', 'year', 'month_num', 'month']
+    required_cols = ['user', 'message', 'date']
     if not all(col in df.columns for col in required_cols):
         raise ValueError(f"DataFrame missing required columns: {required_cols}")
 
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+    cube, plane = _activity(selected_user, df)
 
-    timeline = df.groupby(['year', 'month_num', 'month']).count()['message'].reset_index()
-    timeline['time'] = timeline.apply(lambda x: f"{x['month']}-{x['year']}", axis=1)
-
-    return timeline
+    return cube.monthly(plane)
 
 
 def daily_timeline(selected_user, df):
-    if 'Specific_Date' not in df.columns:
-        raise ValueError("DataFrame missing required column 'Specific_Date'")
+    if 'date' not in df.columns:
+        raise ValueError("DataFrame missing required column 'date'")
 
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+    cube, plane = _activity(selected_user, df)
 
-    return df.groupby('Specific_Date').count()['message'].reset_index()
+    return cube.daily(plane)
 
 
 def week_activity_map(selected_user, df):
-    if 'day_name' not in df.columns:
-        raise ValueError("DataFrame missing required column 'day_name'")
+    if 'date' not in df.columns:
+        raise ValueError("DataFrame missing required column 'date'")
 
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+    cube, plane = _activity(selected_user, df)
 
-    return df['day_name'].value_counts()
+    return cube.weekdays(plane)
 
 
 def month_activity_map(selected_user, df):
-    if 'month' not in df.columns:
-        raise ValueError("DataFrame missing required column 'month'")
+    if 'date' not in df.columns:
+        raise ValueError("DataFrame missing required column 'date'")
 
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+    cube, plane = _activity(selected_user, df)
 
-    return df['month'].value_counts()
+    return cube.months(plane)
 
 
 def activity_heatmap(selected_user, df):
-    required_cols = ['day_name', 'period', 'message']
-    if not all(col in df.columns for col in required_cols):
-        raise ValueError(f"DataFrame missing required columns: {required_cols}")
+    if 'date' not in df.columns:
+        raise ValueError("DataFrame missing required column 'date'")
 
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+    cube, plane = _activity(selected_user, df)
 
-    return df.pivot_table(index='day_name', columns='period', values='message', aggfunc='count').fillna(0)
+    return cube.heatmap(plane)
 
 
 def sentiment_analysis(selected_user, df):
-    required_cols = ['user', 'sentiment', 'vader_sentiment']
-    if not all(col in df.columns for col in required_cols):
-        raise ValueError(f"DataFrame missing required columns: {required_cols}")
+    if not all(col in df.columns for col in ['user', 'message']):
+        raise ValueError("DataFrame missing required columns 'user' or 'message'")
 
-    # Ensure numeric types
-    df = df.copy()
-    df['sentiment'] = pd.to_numeric(df['sentiment'], errors='coerce').fillna(0)
-    df['vader_sentiment'] = pd.to_numeric(df['vader_sentiment'], errors='coerce').fillna(0)
+    _ensure_sentiment(df)
 
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
+    df = _select(selected_user, df)
 
     avg_sentiment = df['sentiment'].mean()
     avg_vader_sentiment = df['vader_sentiment'].mean()
@@ -228,27 +212,41 @@ def sentiment_analysis(selected_user, df):
     return avg_sentiment, avg_vader_sentiment
 
 
+def sentiment_timeline(selected_user, df, freq=None, rolling=None):
+    """Sentiment binned over time (see timeseries.aggregate_sentiment)"""
+    if not all(col in df.columns for col in ['user', 'message', 'date']):
+        raise ValueError("DataFrame missing required columns 'user', 'message' or 'date'")
+
+    _ensure_sentiment(df)
+
+    return timeseries.aggregate_sentiment(_select(selected_user, df), freq, rolling)
+
+
+def sentiment_points(selected_user, df, column, budget=timeseries.DEFAULT_POINT_BUDGET):
+    """At most `budget` raw (date, score) points of `column`, LTTB-downsampled"""
+    if not all(col in df.columns for col in ['user', 'message', 'date']):
+        raise ValueError("DataFrame missing required columns 'user', 'message' or 'date'")
+
+    _ensure_sentiment(df)
+
+    return timeseries.downsample(_select(selected_user, df), column, budget)
+
+
 def first_last_message_times(selected_user, df):
     # Input validation
-    if not isinstance(df, pd.DataFrame):
-        raise ValueError("Input must be a pandas DataFrame")
+    if not isinstance(df, (pd.DataFrame, ChatIndex)):
+        raise ValueError("Input must be a pandas DataFrame or ChatIndex")
     if 'date' not in df.columns:
         raise ValueError("DataFrame missing required column 'date'")
 
-    df = df.copy()
-
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-
-    if df.empty:
-        return None, None
-
     # Get first and last messages
-    first_msg = df.iloc[0]
-    last_msg = df.iloc[-1]
+    first_msg, last_msg = _first_last_rows(selected_user, df)
+    if first_msg is None:
+        return None, None
 
     return first_msg['date'], last_msg['date']
 
+
 def get_conversation_duration(first_msg_time, last_msg_time):
     if not first_msg_time or not last_msg_time:
         return None, None
@@ -258,19 +256,21 @@ def get_conversation_duration(first_msg_time, last_msg_time):
 
 def first_last_message_details(selected_user, df):
     """Returns (first_msg, first_time, last_msg, last_time)"""
-    if not isinstance(df, pd.DataFrame) or 'date' not in df.columns or 'message' not in df.columns:
+    if not isinstance(df, (pd.DataFrame, ChatIndex)) or 'date' not in df.columns or 'message' not in df.columns:
         raise ValueError("DataFrame missing required columns")
 
-    df = df.copy()
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-
-    if df.empty:
+    first_row, last_row = _first_last_rows(selected_user, df)
+    if first_row is None:
         return None, None, None, None
 
-    first_msg = df.iloc[0]['message']
-    first_time = df.iloc[0]['date']
-    last_msg = df.iloc[-1]['message']
-    last_time = df.iloc[-1]['date']
+    return first_row['message'], first_row['date'], last_row['message'], last_row['date']
+
 
-    return first_msg, first_time, last_msg, last_time
+def _first_last_rows(selected_user, df):
+    # A ChatIndex already knows each user's first and last row positions
+    if isinstance(df, ChatIndex):
+        return df.first_row(selected_user), df.last_row(selected_user)
+    df = _select(selected_user, df)
+    if df.empty:
+        return None, None
+    return df.iloc[0], df.iloc[-1]
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import preprocessor
+import sentiment
+import snapshot
+from cache import content_key
+from formats import FORMATS_BY_NAME, detect_format
+
+CHECKPOINT_VERSION = 1
+
+# Text is hashed in slices of this many characters so the prefix is never encoded in one copy
+HASH_BLOCK = 1 << 20
+# Initial window searched backwards for the last message header
+TAIL_WINDOW = 4096
+
+
+def lineage_key(data):
+    # Re-exports of the same chat start with the same first line, whatever was appended since
+    return content_key(data[:data.find('\n') + 1 or len(data)])
+
+
+def prefix_hash(data, offset):
+    digest = hashlib.blake2b(digest_size=16)
+    for start in range(0, offset, HASH_BLOCK):
+        digest.update(data[start:min(start + HASH_BLOCK, offset)].encode('utf-8'))
+    return digest.hexdigest()
+
+
+def last_header_offset(data, pattern):
+    # Start of the last message header, found by widening a window back from the end
+    window = TAIL_WINDOW
+    while True:
+        start = max(0, len(data) - window)
+        if start:
+            start = data.rfind('\n', 0, start) + 1
+        last = None
+        for last in pattern.finditer(data, start):
+            pass
+        if last is not None:
+            return last.start()
+        if start == 0:
+            return None
+        window *= 4
+
+
+def make_checkpoint(data, df, chat_format, source_hash):
+    """Where the export parsed into `df` ended: the offset of its last message
+    header, a hash of everything before it, the last timestamp and row count.
+    A later export that still starts with exactly that prefix only needs the
+    text from the offset onwards re-parsed."""
+    offset = last_header_offset(data, chat_format.pattern)
+    if offset is None or df.empty:
+        return None
+    return {
+        'version': CHECKPOINT_VERSION,
+        'lineage': lineage_key(data),
+        'source_hash': source_hash,
+        'format': chat_format.name,
+        'offset': offset,
+        'prefix_hash': prefix_hash(data, offset),
+        'last_date': df['date'].iloc[-1].isoformat(),
+        'rows': len(df),
+    }
+
+
+def checkpoint_path(directory, lineage):
+    return os.path.join(directory, f"{lineage}.checkpoint.json")
+
+
+def save_checkpoint(checkpoint, directory):
+    path = checkpoint_path(directory, checkpoint['lineage'])
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_checkpoint(directory, lineage):
+    try:
+        with open(checkpoint_path(directory, lineage), encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint.get('format') not in FORMATS_BY_NAME:
+        return None
+    return checkpoint
+
+
+def extend(data, stored, checkpoint):
+    """The frame for `data` built from `stored` (the frame of an earlier
+    export of the same chat) plus a parse of only the text after the
+    checkpoint. The stored last message is re-parsed as well, since more
+    lines may have been appended to it. Returns None when the earlier export
+    is not a prefix of this one."""
+    offset = checkpoint['offset']
+    if len(data) < offset or len(stored) != checkpoint['rows']:
+        return None
+    if prefix_hash(data, offset) != checkpoint['prefix_hash']:
+        return None
+    chat_format = FORMATS_BY_NAME[checkpoint['format']]
+    if not chat_format.pattern.match(data, offset):
+        return None
+
+    tail = preprocessor.preprocess(data[offset:], chat_format)
+    if tail.empty or tail['date'].iloc[0] != pd.Timestamp(checkpoint['last_date']):
+        return None
+
+    # Only the new tail is scored; the stored rows keep their scores
+    if sentiment.has_sentiment(stored):
+        sentiment.add_sentiment(tail)
+        if not sentiment.has_sentiment(tail):
+            # Scoring failed: leave the whole chat unscored rather than mixing in placeholder zeros
+            stored = stored.drop(columns=sentiment.SENTIMENT_COLUMNS)
+            tail = tail.drop(columns=sentiment.SENTIMENT_COLUMNS)
+    return preprocessor.concat_frames([stored.iloc[:-1], tail])
+
+
+def preprocess(data, source_hash, directory, chat_format=None):
+    """preprocess() that reuses the snapshot of an earlier export of the same
+    chat stored under `directory`, when this export extends it. Returns
+    (df, checkpoint, mode) where mode is 'incremental' or 'full'; store the
+    frame with snapshot.save_snapshot(..., source_hash) and then the
+    checkpoint with save_checkpoint() so the next export can build on it."""
+    lineage = lineage_key(data)
+    checkpoint = load_checkpoint(directory, lineage)
+    df, mode = None, 'full'
+    if checkpoint is not None:
+        stored = snapshot.load_snapshot(snapshot.snapshot_path(directory, checkpoint['source_hash']),
+                                        checkpoint['source_hash'])
+        if stored is not None:
+            df = extend(data, stored, checkpoint)
+    if df is not None:
+        mode = 'incremental'
+        chat_format = FORMATS_BY_NAME[checkpoint['format']]
+    else:
+        # Prefix changed (or nothing stored yet): rebuild from scratch
+        if chat_format is None:
+            chat_format = detect_format(data)
+        df = preprocessor.preprocess(data, chat_format)
+    return df, make_checkpoint(data, df, chat_format, source_hash), mode
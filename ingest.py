@@ -0,0 +1,115 @@
+import codecs
+import io
+import os
+import zipfile
+
+# Bytes looked at to pick the encoding, and bytes read per chunk afterwards
+SAMPLE_SIZE = 64 * 1024
+READ_SIZE = 1 << 20
+
+# Longest BOMs first: the UTF-32-LE BOM starts with the UTF-16-LE one
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def detect_encoding(sample):
+    """Encoding of an export from its first bytes: the BOM if there is one,
+    then BOM-less UTF-16 (NUL in every other byte of mostly-ASCII text),
+    then UTF-8 if the sample decodes, else Latin-1."""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if sample:
+        if sample[1::2].count(0) > len(sample) // 4:
+            return 'utf-16-le'
+        if sample[0::2].count(0) > len(sample) // 4:
+            return 'utf-16-be'
+    try:
+        # Not final, so a character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder('utf-8')().decode(sample)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def chat_member(archive):
+    # WhatsApp names the chat "_chat.txt" (iOS) or "WhatsApp Chat with <name>.txt" (Android);
+    # otherwise take the largest text file
+    members = [info for info in archive.infolist() if not info.is_dir() and info.filename.lower().endswith('.txt')]
+    if not members:
+        raise ValueError("No chat .txt file found in the ZIP archive")
+    for info in members:
+        name = os.path.basename(info.filename)
+        if name == '_chat.txt' or name.startswith('WhatsApp Chat'):
+            return info
+    return max(members, key=lambda info: info.file_size)
+
+
+class Export:
+    """An uploaded or on-disk chat export opened for streaming: either a
+    plain text file or the chat member of a WhatsApp ZIP, which is
+    decompressed as it is read rather than extracted. The encoding is
+    detected from the first SAMPLE_SIZE bytes. chunks() and read_text()
+    consume the stream, so use one of them once."""
+
+    def __init__(self, source):
+        # `source` is bytes, a path or a seekable binary file object (e.g. Streamlit's UploadedFile)
+        self._owned = None
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        elif isinstance(source, (str, os.PathLike)):
+            source = self._owned = open(source, 'rb')
+        source.seek(0)
+        self._archive = None
+        self.name = getattr(source, 'name', None)
+        if zipfile.is_zipfile(source):
+            source.seek(0)
+            self._archive = zipfile.ZipFile(source)
+            member = chat_member(self._archive)
+            self.name = member.filename
+            self._stream = self._archive.open(member)
+        else:
+            source.seek(0)
+            self._stream = source
+        self._sample = self._stream.read(SAMPLE_SIZE)
+        self.encoding = detect_encoding(self._sample)
+
+    @property
+    def is_zip(self):
+        return self._archive is not None
+
+    def head_text(self):
+        # Decoded start of the chat, enough to detect its line format
+        return codecs.getincrementaldecoder(self.encoding)('replace').decode(self._sample)
+
+    def chunks(self):
+        # Raw bytes from the start; feed them to preprocessor.iter_preprocess(..., encoding=self.encoding)
+        yield self._sample
+        while True:
+            chunk = self._stream.read(READ_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    def read_text(self):
+        # The whole chat as one string, for the paths that need it in memory
+        return codecs.decode(b''.join(self.chunks()), self.encoding, 'replace')
+
+    def close(self):
+        # A caller-supplied file object is left open
+        if self._archive is not None:
+            self._stream.close()
+            self._archive.close()
+        if self._owned is not None:
+            self._owned.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
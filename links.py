@@ -0,0 +1,84 @@
+import re
+from urllib.parse import urlsplit
+
+import pandas as pd
+from urlextract import URLExtract
+
+from parallel import env_workers, parallel_map
+from profiling import stage
+
+# Cheap test for anything URLExtract could report: a scheme, a dot followed by a
+# TLD-like run of letters, or a dotted IPv4 address. Rows failing it are never
+# handed to the extractor.
+CANDIDATE_PATTERN = re.compile(r'://|[^\W_]\.[^\W\d_]{2,}|\d\.\d+\.\d+\.\d')
+
+DEFAULT_WORKERS = env_workers('CHATFUSION_LINK_WORKERS')
+BATCH_SIZE = 2_000
+# Fewest candidate rows extracted in the pool rather than in-process
+MIN_PARALLEL_CANDIDATES = 10_000
+
+_extractor = None
+
+
+def _init_worker():
+    # URLExtract loads its TLD list on construction, so build one per process
+    global _extractor
+    _extractor = URLExtract()
+
+
+def _extract_batch(messages):
+    if _extractor is None:
+        _init_worker()
+    urls = []
+    for message in messages:
+        try:
+            urls.append(_extractor.find_urls(message))
+        except Exception:
+            urls.append([])  # Skip if URL extraction fails
+    return urls
+
+
+def candidates(messages):
+    # Vectorized prefilter: only these rows can contain a link
+    messages = pd.Series(messages, dtype=object)
+    return messages[messages.str.contains(CANDIDATE_PATTERN, na=False)]
+
+
+def extract_links(messages, workers=None, batch_size=BATCH_SIZE):
+    """URLs found in each candidate row of `messages`, as a Series of lists
+    indexed like the input (rows that can't hold a link are left out).
+    Full TLD-aware extraction runs only on the prefiltered rows, in a
+    process pool when there are many of them."""
+    with stage('links.prefilter', len(messages)):
+        rows = candidates(messages)
+    with stage('links.extract', len(rows)):
+        return _extract(rows, workers, batch_size)
+
+
+def _extract(rows, workers, batch_size):
+    workers = DEFAULT_WORKERS if workers is None else workers
+    batches = parallel_map(_extract_batch, rows.tolist(), workers, batch_size, MIN_PARALLEL_CANDIDATES,
+                           _init_worker)
+    return pd.Series([urls for batch in batches for urls in batch], index=rows.index, dtype=object)
+
+
+def count_links(messages, workers=None):
+    return int(extract_links(messages, workers).str.len().sum())
+
+
+def url_domain(url):
+    # URLExtract also reports bare hosts such as "example.com/path"
+    try:
+        host = urlsplit(url if '://' in url else '//' + url).hostname or ''
+    except ValueError:
+        return ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def link_table(df, workers=None):
+    """One row per extracted link with its sender and domain. Group it by
+    'user' for per-user link counts or by 'domain' for the most shared sites."""
+    found = extract_links(df['message'], workers).explode().dropna()
+    table = pd.DataFrame({'user': df['user'].loc[found.index].to_numpy(), 'url': found.astype(str).to_numpy()})
+    table['domain'] = table['url'].map(url_domain)
+    return table.reset_index(drop=True)
@@ -1,6 +1,12 @@
 import streamlit as st
-import preprocessor, helper
+import preprocessor, helper, formats, cache, snapshot, profiling, incremental, precompute, ingest, figures
+import conversation
+import sentiment
+from chat_index import ChatIndex
 import matplotlib.pyplot as plt
+import matplotlib.patches as mpatches
+import numpy as np
+import pandas as pd
 import seaborn as sns
 
 
@@ -52,6 +58,18 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# With snapshots on (CHATFUSION_SNAPSHOT_DIR), parsed chats and their message text are written to
+# disk on the server, so the privacy notes must not promise otherwise
+if snapshot.SNAPSHOT_DIR:
+    PRIVACY_BADGE = "💾 CHATS ARE SAVED ON THIS SERVER"
+    PRIVACY_NOTES = """• Parsed chats, including every message, are saved on this server so re-uploads load faster  
+    • They stay there after you close the tab, until the server's operator deletes them  """
+else:
+    PRIVACY_BADGE = "🔐 WE NEVER SAVE YOUR CHATS"
+    PRIVACY_NOTES = """• All processing happens in your browser  
+    • Your data is deleted when you close the tab  
+    • We have no server to store your chats  """
+
 # Mobile sidebar instruction
 # ===== HIGH-VISIBILITY MOBILE INSTRUCTIONS =====
 st.markdown("""
@@ -91,11 +109,11 @@ st.markdown("""
 <div class="privacy-box">
 <p style="margin:0;font-size:16px;">
 <span class="pulse-arrow">></span> <strong>Tap the arrow (top-left)</strong> to upload<br>
-<code style="background:#333;color:#fff;padding:2px 6px;border-radius:4px;">_chat.txt</code> from WhatsApp
+the WhatsApp export <code style="background:#333;color:#fff;padding:2px 6px;border-radius:4px;">.zip</code> or <code style="background:#333;color:#fff;padding:2px 6px;border-radius:4px;">_chat.txt</code>
 </p>
-<div class="privacy-badge">🔐 WE NEVER SAVE YOUR CHATS</div>
+<div class="privacy-badge">{privacy_badge}</div>
 </div>
-""", unsafe_allow_html=True)
+""".replace('{privacy_badge}', PRIVACY_BADGE), unsafe_allow_html=True)
 
 with st.expander("🔍 Analyze Any WhatsApp Chat", expanded=False):
     st.markdown("""
@@ -107,7 +125,7 @@ with st.expander("🔍 Analyze Any WhatsApp Chat", expanded=False):
     **🔄 How To Export:**  
     1. Open chat → ⋮ → "Export chat"  
     2. Choose "Without Media"  
-    3. Extract the ZIP file  
+    3. Upload the ZIP as it is (no need to extract it)  
 
     **📊 Insights You'll Get:  
     1. Sentiment Trends (TextBlob + VADER)  
@@ -117,15 +135,13 @@ with st.expander("🔍 Analyze Any WhatsApp Chat", expanded=False):
 
     <div style="background:#000;color:#fff;padding:12px;border-radius:8px;margin:10px 0;border:1px solid #444">
     <strong>🔒 PRIVACY PROTECTED</strong>  
-    • All processing happens in your browser  
-    • Your data is deleted when you close the tab  
-    • We have no server to store your chats  
+    {privacy_notes}
     </div>
 
     ⚠️ <strong>For Best Results:</strong>  
     • Use exported chats <3 months old  
     • Always select "Without Media"  
-    """, unsafe_allow_html=True)
+    """.replace('{privacy_notes}', PRIVACY_NOTES), unsafe_allow_html=True)
 
 #plt.rcParams['font.family'] = 'DejaVu Sans'  # Fixes missing emoji/glyph warnings
 # Set font early to prevent glyph warnings
@@ -134,44 +150,201 @@ plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'Liberation Sans']
 
 st.sidebar.title("Chat Fusion: Sentiment Analysis  and Behavioural Insights from WhatsApp Conversations")
 
+# Per-stage timings are only collected while the panel is on; each rerun starts a fresh profile
+# that belongs to this session alone (work done by background threads is not part of it)
+diagnostics = st.sidebar.checkbox("Diagnostics", value=profiling.ENABLED_BY_DEFAULT)
+profiling.collect(diagnostics)
+
+
+def save_snapshot(df, chat_key):
+    # Only when CHATFUSION_SNAPSHOT_DIR is set; lets later uploads of the same export skip parsing
+    if snapshot.SNAPSHOT_DIR:
+        snapshot.save_snapshot(df, snapshot.snapshot_path(snapshot.SNAPSHOT_DIR, chat_key), chat_key)
+
+
+# Bin widths offered for the sentiment trend; "Auto" picks one from the chat's time span
+SENTIMENT_INTERVALS = {'Auto': None, 'Hourly': 'H', 'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M'}
+SENTIMENT_ROLLING_BINS = 7
+INTERVAL_NAMES = {'H': 'hour', 'D': 'day', 'W': 'week', 'M': 'month'}
+
+
+def plot_sentiment_trend(timeline, points, column):
+    # Binned mean with its interquartile band, over a downsampled scatter of individual messages
+    fig, ax = plt.subplots()
+
+    scores = points[column].to_numpy()
+    colors = np.where(scores < -0.1, 'red', np.where(scores > 0.1, 'green', 'gray'))
+    ax.scatter(points['date'], scores, color=colors, s=8, alpha=0.4)
+
+    handles = [mpatches.Patch(color='red', label='Negative'),
+               mpatches.Patch(color='gray', label='Neutral'),
+               mpatches.Patch(color='green', label='Positive')]
+    if not timeline.empty:
+        ax.fill_between(timeline.index, timeline[f'{column}_p25'], timeline[f'{column}_p75'],
+                        color='steelblue', alpha=0.2)
+        handles += ax.plot(timeline.index, timeline[f'{column}_mean'], color='steelblue',
+                           label=f"Mean per {INTERVAL_NAMES[timeline.attrs['freq']]}")
+        if f'{column}_rolling' in timeline.columns:
+            handles += ax.plot(timeline.index, timeline[f'{column}_rolling'], color='black', linewidth=1,
+                               label=f"{SENTIMENT_ROLLING_BINS}-{INTERVAL_NAMES[timeline.attrs['freq']]} rolling mean")
+
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Sentiment Score (-1 to 1)")
+    plt.xticks(rotation='vertical')
+    ax.legend(handles=handles)
+    return fig
+
+
+def plot_timeline(x, y, color):
+    fig, ax = plt.subplots()
+    ax.plot(x, y, color=color)
+    plt.xticks(rotation='vertical')
+    return fig
+
+
+def plot_bars(x, y, color=None, horizontal=False):
+    fig, ax = plt.subplots()
+    if horizontal:
+        ax.barh(x, y, color=color)
+    else:
+        ax.bar(x, y, color=color)
+    plt.xticks(rotation='vertical')
+    return fig
+
+
+def plot_heatmap(grid):
+    fig, ax = plt.subplots()
+    sns.heatmap(grid, ax=ax)
+    return fig
+
+
+def plot_image(image):
+    fig, ax = plt.subplots()
+    ax.imshow(image, interpolation='bilinear')
+    ax.axis("off")
+    return fig
+
+
+def plot_pie(values, labels):
+    fig, ax = plt.subplots()
+    ax.pie(values, labels=labels, autopct="%0.2f")
+    return fig
+
+
+def show_diagnostics():
+    st.sidebar.subheader("Diagnostics")
+    records = profiling.records()
+    if not records:
+        st.sidebar.write("No stages ran on this rerun.")
+        return
+    st.sidebar.dataframe(pd.DataFrame(records))
+    st.sidebar.download_button("Download profile (JSON)", profiling.to_json(),
+                               file_name="chatfusion_profile.json", mime="application/json")
+
+
 uploaded_file = st.sidebar.file_uploader("Choose a file")
 if uploaded_file is not None:
     try:
         bytes_data = uploaded_file.getvalue()
-        try:
-            data = bytes_data.decode("utf-8")
-        except UnicodeDecodeError:
-            try:
-                data = bytes_data.decode("utf-16")
-            except UnicodeDecodeError:
-                data = bytes_data.decode("latin-1")
-
-        # Validate it looks like a WhatsApp export
-        if not any(x in data[:100] for x in [' - ', ']: ', '[']):
-            st.error("This doesn't appear to be a WhatsApp chat export file")
-            st.stop()
-
-        df = preprocessor.preprocess(data)
-
-        # Additional type safety
-        df['message'] = df['message'].astype(str)
-        df['user'] = df['user'].astype(str)
+        chat_key = cache.content_key(bytes_data)
+
+        # Reruns on the same upload reuse the parsed chat, including any sentiment scored on it. The
+        # session keeps its open chat alive, so cache eviction (or a chat bigger than the whole budget)
+        # only frees memory for other sessions and never forces this one to reparse
+        index = cache.FRAMES.get(chat_key)
+        if index is None:
+            open_chat = st.session_state.get('chat_index')
+            if open_chat is not None and open_chat.key == chat_key:
+                index = open_chat
+        df = None
+        if index is None and snapshot.SNAPSHOT_DIR:
+            with profiling.stage('snapshot.load'):
+                df = snapshot.load_snapshot(snapshot.snapshot_path(snapshot.SNAPSHOT_DIR, chat_key), chat_key)
+        if index is None and df is None:
+            # A ZIP export is read straight from the archive; the encoding comes from the first bytes
+            with ingest.Export(bytes_data) as export:
+                # Validate it looks like a WhatsApp export; the parsers pick the line format themselves,
+                # reading past the head when it can't tell day-first from month-first dates
+                try:
+                    formats.detect_format(export.head_text())
+                except ValueError:
+                    st.error("This doesn't appear to be a WhatsApp chat export file")
+                    st.stop()
+
+                if snapshot.SNAPSHOT_DIR or preprocessor.DEFAULT_PARSE_WORKERS > 1:
+                    # Incremental and parallel parsing both work on the whole text
+                    with profiling.stage('decode', len(bytes_data)):
+                        data = export.read_text()
+                    if snapshot.SNAPSHOT_DIR:
+                        # A re-export of a stored chat only has its new messages parsed and scored
+                        df, checkpoint, _ = incremental.preprocess(data, chat_key, snapshot.SNAPSHOT_DIR)
+                        save_snapshot(df, chat_key)
+                        if checkpoint is not None:
+                            incremental.save_checkpoint(checkpoint, snapshot.SNAPSHOT_DIR)
+                    else:
+                        df = preprocessor.preprocess(data)
+                else:
+                    # Decoded and parsed chunk by chunk, so the full text is never held in memory
+                    df = preprocessor.concat_frames(list(preprocessor.iter_preprocess(
+                        export.chunks(), encoding=export.encoding)))
+
+        if index is None:
+            # Built once per chat; every view selects users through it
+            with profiling.stage('chat_index', len(df)):
+                index = ChatIndex(df, key=chat_key)
+                # Derived state (activity cube, text stats, sentiment) is counted against the budget as it is built
+                index.on_grow = lambda nbytes: cache.FRAMES.grow(chat_key, nbytes)
+                cache.FRAMES.set(chat_key, index)
+        st.session_state['chat_index'] = index
+        df = index.df
 
     except Exception as e:
         st.error(f"Error processing file: {str(e)}")
         st.stop()
 
     # Fetch the unique users
-    user_list = df['user'].unique().tolist()
-    user_list.remove('group_notification')
-    user_list.sort()
+    user_list = [user for user in index.users if user != 'group_notification']
     user_list.insert(0, "Overall")
 
+    # Views are computed in the background from the moment the chat is loaded; scores are
+    # saved to the snapshot once computed so reloads skip scoring too
+    scheduler, created = precompute.scheduler_for(index, on_sentiment=lambda df: save_snapshot(df, chat_key))
+    if created:
+        scheduler.schedule_all(user_list, sentiment_options=[
+            (helper.sentiment_timeline, ('Overall',), {'freq': None, 'rolling': SENTIMENT_ROLLING_BINS}),
+            (helper.sentiment_points, ('Overall', 'sentiment'), {}),
+            (helper.sentiment_points, ('Overall', 'vader_sentiment'), {}),
+        ])
+
+    def view(helper_fn, *args, **options):
+        # Served from the background results (cached per view, chat and arguments across reruns),
+        # waiting only for views that are still being computed
+        with profiling.stage(f'helper.{helper_fn.__name__}', len(index)) as record:
+            if record is not None:
+                record['cached'] = precompute.view_key(helper_fn, chat_key, args, options) in cache.VIEWS
+            return scheduler.get(helper_fn, *args, **options)
+
+    def chart(name, draw, *options, keep=True):
+        # Each chart is drawn once per (chat, user, chart, options) and served as a cached PNG after that
+        key = (chat_key, selected_user, name) + options
+        with profiling.stage(f'render.{name}') as record:
+            if record is not None:
+                record['cached'] = keep and key + (figures.FIGURE_DPI,) in cache.FIGURES
+            st.image(figures.cached_png(key, draw, keep=keep), use_column_width=True)
+
+    done, total = scheduler.progress()
+    if done < total:
+        st.sidebar.progress(done / total, text=f"Preparing views in the background: {done}/{total}")
+        st.sidebar.button("Refresh progress", key='refresh_progress')
+    else:
+        st.sidebar.caption("✅ All views ready")
+
     selected_user = st.sidebar.selectbox("Show analysis with respect to", user_list)
 
     if st.sidebar.button("Show Sentiment Analysis", key='sentiment_analysis'):
         # Display sentiment analysis
-        avg_sentiment, avg_vader_sentiment = helper.sentiment_analysis(selected_user, df)
+        scheduler.ensure_sentiment()
+        avg_sentiment, avg_vader_sentiment = view(helper.sentiment_analysis, selected_user)
         st.title("Sentiment Analysis")
 
         # Sentiment Analysis Explanation
@@ -206,6 +379,8 @@ if uploaded_file is not None:
             st.header("Average Sentiment (VADER):")
             st.write(f"{avg_vader_sentiment:.2f} (Range: -1.0 to 1.0)")
 
+    sentiment_interval = st.sidebar.selectbox("Sentiment interval", list(SENTIMENT_INTERVALS))
+
     if st.sidebar.button("Show Sentiment Over Time", key='sentiment_over_time'):
         # Sentiment over time
         st.title("Sentiment Over Time")
@@ -224,51 +399,26 @@ if uploaded_file is not None:
         ⚪ **Gray** → Neutral sentiment  
         🔴 **Red** → Negative sentiment  
 
+        On long chats a representative sample of messages is plotted. The **blue line** is the average score per time bin (the shaded band covers the middle half of messages) and the **black line** smooths it over several bins.  
+
         By comparing these two models, you can see how each interprets mood shifts in conversations differently. 🚀
         """)
 
-        # Improved TextBlob Sentiment Graph
-        st.header("Sentiment Trend (TextBlob)")
-        fig, ax = plt.subplots()
-
-        colors = ['red' if x < -0.1 else 'green' if x > 0.1 else 'gray' for x in df['sentiment']]
-        ax.scatter(df['date'], df['sentiment'], color=colors)
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Sentiment Score (-1 to 1)")
-        plt.xticks(rotation='vertical')
-
-        # Legend
-        import matplotlib.patches as mpatches
-
-        negative_patch = mpatches.Patch(color='red', label='Negative')
-        neutral_patch = mpatches.Patch(color='gray', label='Neutral')
-        positive_patch = mpatches.Patch(color='green', label='Positive')
-        ax.legend(handles=[negative_patch, neutral_patch, positive_patch])
-
-        st.pyplot(fig)
+        # Scores are computed here on first use and kept on the cached frame
+        scheduler.ensure_sentiment()
 
-        # Plot VADER sentiment over time (Keep this as it is)
-        # Improved VADER Sentiment Graph
-        st.header("Sentiment Trend (VADER)")
-        fig, ax = plt.subplots()
-
-        colors = ['red' if x < -0.1 else 'green' if x > 0.1 else 'gray' for x in df['vader_sentiment']]
-        ax.scatter(df['date'], df['vader_sentiment'], color=colors)
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Sentiment Score (-1 to 1)")
-        plt.xticks(rotation='vertical')
-
-        # Legend
-        negative_patch = mpatches.Patch(color='red', label='Negative')
-        neutral_patch = mpatches.Patch(color='gray', label='Neutral')
-        positive_patch = mpatches.Patch(color='green', label='Positive')
-        ax.legend(handles=[negative_patch, neutral_patch, positive_patch])
-
-        st.pyplot(fig)
+        freq = SENTIMENT_INTERVALS[sentiment_interval]
+        for column, model in [('sentiment', 'TextBlob'), ('vader_sentiment', 'VADER')]:
+            st.header(f"Sentiment Trend ({model})")
+            timeline = view(helper.sentiment_timeline, selected_user, freq=freq, rolling=SENTIMENT_ROLLING_BINS)
+            points = view(helper.sentiment_points, selected_user, column)
+            # A trend of placeholder scores (scoring failed) is not cached, so a successful retry shows up
+            chart(f'sentiment_trend.{column}', lambda: plot_sentiment_trend(timeline, points, column),
+                  freq, SENTIMENT_ROLLING_BINS, keep=sentiment.has_sentiment(index.df))
 
     if st.sidebar.button("Show Statistics", key='statistics'):
          # === First/Last Message Details ===
-        first_msg, first_time, last_msg, last_time = helper.first_last_message_details(selected_user, df)
+        first_msg, first_time, last_msg, last_time = view(helper.first_last_message_details, selected_user)
         total_days, total_hours = helper.get_conversation_duration(first_time, last_time)
 
         st.title("⏳ Conversation Timeline")
@@ -311,7 +461,7 @@ if uploaded_file is not None:
         </div>
         """, unsafe_allow_html=True)
         
-        num_messages, words, num_media_messages, num_links = helper.fetch_stats(selected_user, df)
+        num_messages, words, num_media_messages, num_links = view(helper.fetch_stats, selected_user)
         st.title("Statistics Of The Chats")
 
         col1, col2, col3, col4 = st.columns(4)
@@ -332,21 +482,20 @@ if uploaded_file is not None:
             st.header("Links Shared:")
             st.title(num_links)
 
+        if num_links:
+            st.subheader("Most Shared Domains")
+            st.dataframe(view(helper.link_domains, selected_user).head(10))
+
         # Monthly basis timeline
         st.title("Monthly Timeline Data")
-        timeline = helper.monthly_timeline(selected_user, df)
-        fig, ax = plt.subplots()
-        ax.plot(timeline['time'], timeline['message'], color='red')
-        plt.xticks(rotation='vertical')
-        st.pyplot(fig)
+        timeline = view(helper.monthly_timeline, selected_user)
+        chart('monthly_timeline', lambda: plot_timeline(timeline['time'], timeline['message'], 'red'))
 
         # Daily basis timeline
         st.title("Daily Timeline Data")
-        daily_timeline = helper.daily_timeline(selected_user, df)
-        fig, ax = plt.subplots()
-        ax.plot(daily_timeline['Specific_Date'], daily_timeline['message'], color='brown')
-        plt.xticks(rotation='vertical')
-        st.pyplot(fig)
+        daily_timeline = view(helper.daily_timeline, selected_user)
+        chart('daily_timeline', lambda: plot_timeline(daily_timeline['Specific_Date'], daily_timeline['message'],
+                                                      'brown'))
 
         # Activity map
         st.title('Activity Map')
@@ -354,67 +503,50 @@ if uploaded_file is not None:
 
         with col1:
             st.header("Most Busy Day")
-            busy_day = helper.week_activity_map(selected_user, df)
-            fig, ax = plt.subplots()
-            ax.bar(busy_day.index, busy_day.values)
-            plt.xticks(rotation='vertical')
-            st.pyplot(fig)
+            busy_day = view(helper.week_activity_map, selected_user)
+            chart('week_activity_map', lambda: plot_bars(busy_day.index, busy_day.values))
 
         with col2:
             st.header("Most Busy Month")
-            busy_month = helper.month_activity_map(selected_user, df)
-            fig, ax = plt.subplots()
-            ax.bar(busy_month.index, busy_month.values, color='purple')
-            plt.xticks(rotation='vertical')
-            st.pyplot(fig)
+            busy_month = view(helper.month_activity_map, selected_user)
+            chart('month_activity_map', lambda: plot_bars(busy_month.index, busy_month.values, 'purple'))
 
         st.title("Weekly Activity Map")
-        user_heatmap = helper.activity_heatmap(selected_user, df)
-        fig, ax = plt.subplots()
-        ax = sns.heatmap(user_heatmap)
-        st.pyplot(fig)
+        user_heatmap = view(helper.activity_heatmap, selected_user)
+        chart('activity_heatmap', lambda: plot_heatmap(user_heatmap))
 
         # Finding the busiest users in the group (Group level)
         if selected_user == 'Overall':
             st.title("Most Busy User")
-            x, new_df = helper.most_busy_users(df)
-            fig, ax = plt.subplots()
+            x, new_df = view(helper.most_busy_users)
 
             col1, col2 = st.columns(2)
 
             with col1:
-                ax.bar(x.index, x.values, color='red')
-                plt.xticks(rotation='vertical')
-                st.pyplot(fig)
+                chart('most_busy_users', lambda: plot_bars(x.index, x.values, 'red'))
             with col2:
                 st.dataframe(new_df)
 
         # Wordcloud
         st.title("WordCloud")
-        df_wc = helper.create_wordcloud(selected_user, df)
-        if df_wc:
-            fig, ax = plt.subplots()
-            ax.imshow(df_wc, interpolation='bilinear')
-            ax.axis("off")
-            st.pyplot(fig)
+        df_wc = view(helper.create_wordcloud, selected_user)
+        if df_wc is not None:
+            chart('wordcloud', lambda: plot_image(df_wc))
         else:
             st.write("Not enough data to generate a wordcloud for the selected user.")
 
         # Most common words
         st.title('Most Common Words')
-        most_common_df = helper.most_common_words(selected_user, df)
+        most_common_df = view(helper.most_common_words, selected_user)
 
         if not most_common_df.empty and 0 in most_common_df.columns and 1 in most_common_df.columns:
-            fig, ax = plt.subplots()
-            ax.barh(most_common_df[0], most_common_df[1])
-            plt.xticks(rotation='vertical')
-            st.pyplot(fig)
+            chart('most_common_words', lambda: plot_bars(most_common_df[0], most_common_df[1], horizontal=True))
         else:
             st.write("Not enough data to display the most common words for the selected user.")
 
         # Emoji analysis
         st.title('Emojis Analysis Data')
-        emoji_df = helper.emoji_helper(selected_user, df)
+        emoji_df = view(helper.emoji_helper, selected_user)
 
         if not emoji_df.empty and 1 in emoji_df.columns:
             col1, col2 = st.columns(2)
@@ -422,8 +554,54 @@ if uploaded_file is not None:
             with col1:
                 st.dataframe(emoji_df)
             with col2:
-                fig, ax = plt.subplots()
-                ax.pie(emoji_df[1].head(), labels=emoji_df[0].head(), autopct="%0.2f")
-                st.pyplot(fig)
+                chart('emoji', lambda: plot_pie(emoji_df[1].head(), emoji_df[0].head()))
         else:
             st.write("No emojis found for the selected user.")
+
+    idle_minutes = st.sidebar.number_input("Session idle gap (minutes)", min_value=1, max_value=1440,
+                                           value=conversation.DEFAULT_IDLE_MINUTES)
+
+    if st.sidebar.button("Show Conversation Dynamics", key='conversation_dynamics'):
+        st.title("Conversation Dynamics")
+        st.write(f"""
+        A **session** is a run of messages with no gap longer than **{idle_minutes} minutes**. A **reply** is a message
+        that answers someone else within that gap; its latency is the time since the message it follows.
+        """)
+
+        summary = view(conversation.session_summary, selected_user, idle_minutes=idle_minutes)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.header("Sessions:")
+            st.title(summary['sessions'])
+        with col2:
+            st.header("Median Length:")
+            st.title(f"{summary['median_minutes']:.0f} min")
+        with col3:
+            st.header("Messages / Session:")
+            st.title(summary['mean_messages'])
+        with col4:
+            st.header("Sessions Started:")
+            st.title(summary['started'])
+
+        st.title("Reply Times")
+        replies = view(conversation.reply_times, selected_user, idle_minutes=idle_minutes)
+        if replies.empty:
+            st.write("No replies found for the selected user.")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                chart('reply_times', lambda: plot_bars(replies['user'], replies['median_minutes'], 'teal',
+                                                       horizontal=True), idle_minutes)
+            with col2:
+                st.dataframe(replies)
+
+        st.title("Gaps Between Messages")
+        gaps = view(conversation.gap_distribution, selected_user)
+        chart('gap_distribution', lambda: plot_bars(gaps.index, gaps.values, 'orange'))
+
+        st.title("Longest Sessions")
+        sessions = view(conversation.conversation_sessions, selected_user, idle_minutes=idle_minutes)
+        st.dataframe(sessions.nlargest(10, 'messages'))
+
+if diagnostics:
+    show_diagnostics()
@@ -0,0 +1,24 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def env_workers(name, default=1):
+    # Pool size from an environment variable, e.g. CHATFUSION_PARSE_WORKERS
+    return int(os.environ.get(name, default))
+
+
+def parallel_map(fn, items, workers, batch_size=None, min_items=0, initializer=None):
+    """Results of `fn` over `items`, in input order, computed in a pool of
+    `workers` processes. With `batch_size`, `fn` is called on lists of up to
+    that many items and returns one result per list. With one worker, or
+    fewer than `min_items` items (where starting the pool and pickling cost
+    more than they save), everything runs in this process instead: one call
+    per item, or a single call on all items when batching. `initializer`
+    runs once in each pool process, so `fn` must not rely on it in-process."""
+    if workers <= 1 or len(items) < min_items:
+        return [fn(items)] if batch_size else [fn(item) for item in items]
+    if batch_size:
+        items = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as pool:
+        # map() yields in submission order, so the output is deterministic
+        return list(pool.map(fn, items))
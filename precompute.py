@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+import helper
+import sentiment
+from aggregates import NOTIFICATION_USER
+
+# Background threads per chat; more than one mostly helps while sentiment scoring is in a process pool
+DEFAULT_WORKERS = int(os.environ.get('CHATFUSION_PRECOMPUTE_WORKERS', 1))
+# Chats whose schedulers are kept alive; older ones have their pending work cancelled
+MAX_SCHEDULERS = 4
+
+# What the Statistics page asks for, per selected user
+USER_VIEWS = [helper.first_last_message_details, helper.fetch_stats, helper.monthly_timeline,
+              helper.daily_timeline, helper.week_activity_map, helper.month_activity_map,
+              helper.activity_heatmap, helper.most_common_words, helper.emoji_helper, helper.create_wordcloud]
+# Word clouds are large images, so only the Overall one is drawn ahead of time
+PER_USER_VIEWS = [helper_fn for helper_fn in USER_VIEWS if helper_fn is not helper.create_wordcloud]
+# Only the busiest users get their views precomputed; the rest are computed when selected
+MAX_PRECOMPUTE_USERS = int(os.environ.get('CHATFUSION_PRECOMPUTE_USERS', 20))
+SENTIMENT_VIEWS = [helper.sentiment_analysis]
+# Views that score the frame on first use; they wait for the scheduler's own scoring instead
+NEEDS_SENTIMENT = {helper.sentiment_analysis, helper.sentiment_timeline, helper.sentiment_points}
+
+
+def view_key(helper_fn, chat_key, args, options):
+    # Key of a helper result in cache.VIEWS
+    return (helper_fn.__name__, chat_key) + tuple(args) + tuple(sorted(options.items()))
+
+
+class Scheduler:
+    """Computes the helper views of one chat in background threads as soon
+    as it is loaded, storing each result in cache.VIEWS under the key
+    view_key() gives. get() serves a view from there, waits for it if it is
+    being computed, or computes it on the spot if it hasn't started yet, so
+    a page only ever waits for what is still missing."""
+
+    def __init__(self, index, on_sentiment=None, workers=DEFAULT_WORKERS):
+        self.index = index
+        self.chat_key = index.key
+        self.on_sentiment = on_sentiment
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chatfusion-precompute')
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._score_lock = threading.Lock()
+        self._sentiment_queued = False
+        self.total = 0
+        self.done = 0
+
+    def _run(self, key, helper_fn, args, options):
+        try:
+            return self._cached(key, helper_fn, args, options)
+        finally:
+            with self._lock:
+                self.done += 1
+                # Finished results live in cache.VIEWS; the future only mattered while running
+                self._futures.pop(key, None)
+
+    def submit(self, helper_fn, *args, **options):
+        key = view_key(helper_fn, self.chat_key, args, options)
+        with self._lock:
+            if key in self._futures or key in cache.VIEWS:
+                return
+            self.total += 1
+            self._futures[key] = self._pool.submit(self._run, key, helper_fn, args, options)
+
+    def _cached(self, key, helper_fn, args, options):
+        missing = object()
+        value = cache.VIEWS.get(key, missing)
+        if value is missing:
+            if helper_fn in NEEDS_SENTIMENT:
+                self.ensure_sentiment()
+            value = helper_fn(*args, self.index, **options)
+            # Views of placeholder scores (scoring failed) are not kept, so a later retry replaces them
+            if helper_fn not in NEEDS_SENTIMENT or sentiment.has_sentiment(self.index.df):
+                cache.VIEWS.set(key, value)
+        return value
+
+    def ensure_sentiment(self):
+        # Scores the frame once; a caller arriving while scoring runs waits for it
+        with self._score_lock:
+            if not sentiment.has_sentiment(self.index.df):
+                # The index swaps in a new, scored frame
+                df = self.index.ensure_sentiment()
+                # A failed run leaves placeholder zeros that must not be saved as scores
+                if self.on_sentiment is not None and sentiment.has_sentiment(df):
+                    self.on_sentiment(df)
+
+    def _run_score(self):
+        try:
+            self.ensure_sentiment()
+        finally:
+            with self._lock:
+                self.done += 1
+
+    def submit_sentiment(self):
+        with self._lock:
+            if not self._sentiment_queued:
+                self._sentiment_queued = True
+                self.total += 1
+                self._pool.submit(self._run_score)
+
+    def get(self, helper_fn, *args, **options):
+        key = view_key(helper_fn, self.chat_key, args, options)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and future.cancel():
+                self._futures.pop(key)
+                self.total -= 1
+                future = None
+        if future is not None:
+            return future.result()
+        return self._cached(key, helper_fn, args, options)
+
+    def schedule_all(self, users, sentiment_options=()):
+        """Queues the Overall views, then sentiment scoring and the sentiment
+        views, then the statistics of the MAX_PRECOMPUTE_USERS busiest of
+        `users`. `sentiment_options` holds the (helper_fn, args, options) the
+        sentiment pages will ask for."""
+        for helper_fn in USER_VIEWS:
+            self.submit(helper_fn, 'Overall')
+        self.submit(helper.most_busy_users)
+        self.submit(helper.link_domains, 'Overall')
+
+        self.submit_sentiment()
+        for helper_fn in SENTIMENT_VIEWS:
+            self.submit(helper_fn, 'Overall')
+        for helper_fn, args, options in sentiment_options:
+            self.submit(helper_fn, *args, **options)
+
+        wanted = set(users) - {'Overall', NOTIFICATION_USER}
+        busiest = [user for user in self.index.message_counts().index if user in wanted]
+        for user in busiest[:MAX_PRECOMPUTE_USERS]:
+            for helper_fn in PER_USER_VIEWS + SENTIMENT_VIEWS:
+                self.submit(helper_fn, user)
+
+    def progress(self):
+        with self._lock:
+            return self.done, self.total
+
+    def cancel(self):
+        # Drops queued work; anything already running finishes in the background
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_schedulers = OrderedDict()
+_schedulers_lock = threading.Lock()
+
+
+def scheduler_for(index, on_sentiment=None):
+    """The chat's Scheduler, created (without scheduling anything yet) the
+    first time the chat is seen; reruns of the same chat share it. A chat
+    whose ChatIndex was rebuilt (e.g. after cache.FRAMES evicted it) gets a
+    new Scheduler, and the one working on the old index is cancelled."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(index.key)
+        if scheduler is not None and scheduler.index is index:
+            _schedulers.move_to_end(index.key)
+            return scheduler, False
+        if scheduler is not None:
+            scheduler.cancel()
+        scheduler = _schedulers[index.key] = Scheduler(index, on_sentiment)
+        _schedulers.move_to_end(index.key)
+        while len(_schedulers) > MAX_SCHEDULERS:
+            _, stale = _schedulers.popitem(last=False)
+            stale.cancel()
+        return scheduler, True
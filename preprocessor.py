@@ -1,76 +1,263 @@
 import re
+import codecs
+import itertools
+from functools import partial
+import numpy as np
 import pandas as pd
-from textblob import TextBlob
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from formats import FORMATS_BY_NAME, PROBE_SIZE, detect_format, settle_order
+from parallel import env_workers, parallel_map
+from profiling import stage
 
+DEFAULT_CHUNK_SIZE = 50_000
 
-def preprocess(data):
-    pattern = r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s[APap][Mm]\s-\s'
-    messages = re.split(pattern, data)[1:]
-    dates = re.findall(pattern, data)
+# Processes used to parse one export; override per call or with CHATFUSION_PARSE_WORKERS
+DEFAULT_PARSE_WORKERS = env_workers('CHATFUSION_PARSE_WORKERS')
+# Smallest export (in characters) worth splitting across the pool
+MIN_PARALLEL_CHARS = 8_000_000
 
+# Sender is everything up to the first ": ", the rest is the message body
+USER_MESSAGE_PATTERN = re.compile(r'^(?P<user>[\w\W]+?):\s(?P<message>[\w\W]*)')
+
+MONTH_NAMES = np.array(['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                        'August', 'September', 'October', 'November', 'December'], dtype=object)
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+                     dtype=object)
+# Hour-of-day -> "h-(h+1)" bucket label used by the activity heatmap
+PERIOD_LABELS = np.array(['00-1'] + [f"{h}-{h + 1}" for h in range(1, 23)] + ['23-00'], dtype=object)
+
+MONTH_DTYPE = pd.CategoricalDtype(MONTH_NAMES, ordered=True)
+DAY_DTYPE = pd.CategoricalDtype(DAY_NAMES, ordered=True)
+PERIOD_DTYPE = pd.CategoricalDtype(PERIOD_LABELS, ordered=True)
+
+# Compact column dtypes of the preprocessed frame; 'user' is a categorical
+# whose categories depend on the chat. 'Specific_Date' is the message date at
+# midnight and 'sentiment'/'vader_sentiment' (added lazily) are float32.
+SCHEMA = {
+    'date': 'datetime64[ns]',
+    'user': 'category',
+    'message': object,
+    'Specific_Date': 'datetime64[ns]',
+    'year': np.int16,
+    'month_num': np.int8,
+    'month': MONTH_DTYPE,
+    'day': np.int8,
+    'day_name': DAY_DTYPE,
+    'hour': np.int8,
+    'minute': np.int8,
+    'period': PERIOD_DTYPE,
+    'sentiment': np.float32,
+    'vader_sentiment': np.float32,
+}
+
+
+def preprocess(data, chat_format=None, workers=None):
+    if chat_format is None:
+        with stage('preprocess.detect_format'):
+            chat_format = detect_format(data)
+
+    workers = DEFAULT_PARSE_WORKERS if workers is None else workers
+    if workers > 1 and len(data) >= MIN_PARALLEL_CHARS:
+        return _preprocess_parallel(data, chat_format, workers)
+
+    pattern = chat_format.pattern
+    with stage('preprocess.split') as record:
+        messages = pattern.split(data)[1:]
+        dates = pattern.findall(data)
+        if record is not None:
+            record['rows'] = len(dates)
+
+    return _build_frame(messages, dates, chat_format)
+
+
+def split_points(data, pattern, parts):
+    """Offsets that cut `data` into about `parts` pieces, each cut at the
+    start of a line that begins with a message header, so no message is
+    split across two pieces."""
+    points = [0]
+    for i in range(1, parts):
+        pos = max(len(data) * i // parts, points[-1] + 1)
+        while pos < len(data):
+            pos = data.find('\n', pos - 1) + 1
+            if not pos:
+                pos = len(data)
+            elif pattern.match(data, pos):
+                break
+            else:
+                pos += 1
+        if pos >= len(data):
+            break
+        points.append(pos)
+    points.append(len(data))
+    return points
+
+
+def _parse_chunk(format_name, text):
+    chat_format = FORMATS_BY_NAME[format_name]
+    return _build_frame(chat_format.pattern.split(text)[1:], chat_format.pattern.findall(text), chat_format)
+
+
+def _preprocess_parallel(data, chat_format, workers):
+    # Each chunk starts on a message header, so parsing chunks separately and
+    # concatenating them in order gives exactly the serial result
+    with stage('preprocess.parallel', None) as record:
+        points = split_points(data, chat_format.pattern, workers * 4)
+        chunks = [data[start:stop] for start, stop in zip(points, points[1:])]
+        # Results come back in input order, so the frames are in file order
+        frames = parallel_map(partial(_parse_chunk, chat_format.name), chunks, workers)
+        df = concat_frames(frames)
+        if record is not None:
+            record['rows'] = len(df)
+    return df
+
+
+def _iter_lines(source, encoding='utf-8'):
+    # Accepts a text/binary file object or any iterable of str/bytes chunks and
+    # yields complete lines (newline kept), decoding bytes incrementally.
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    buffer = ''
+    for chunk in source:
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = decoder.decode(chunk)
+        buffer += chunk
+        if '\n' not in buffer:
+            continue
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            yield line + '\n'
+    buffer += decoder.decode(b'', final=True)
+    if buffer:
+        yield buffer
+
+
+def _probe_lines(lines):
+    # Buffer the first PROBE_SIZE characters so the format can be detected
+    # before any line is consumed, then replay them
+    head, size = [], 0
+    for line in lines:
+        head.append(line)
+        size += len(line)
+        if size >= PROBE_SIZE:
+            break
+    text = ''.join(head)
+    chat_format = detect_format(text)
+    if settle_order(chat_format, text) is None:
+        # No day above 12 yet, so day-first vs month-first is open: keep buffering until a date settles it
+        for line in lines:
+            head.append(line)
+            settled = settle_order(chat_format, line)
+            if settled is not None:
+                chat_format = settled
+                break
+    return chat_format, itertools.chain(head, lines)
+
+
+def iter_messages(source, encoding='utf-8', chat_format=None):
+    """Yields (message_date, user_message) pairs from a chat export, one
+    message at a time. Lines that don't start with a timestamp header are
+    continuations of the previous message."""
+    lines = _iter_lines(source, encoding)
+    if chat_format is None:
+        chat_format, lines = _probe_lines(lines)
+    return _iter_records(lines, chat_format)
+
+
+def _iter_records(lines, chat_format):
+    header = chat_format.pattern
+    date, parts = None, []
+    for line in lines:
+        match = header.match(line)
+        if match:
+            if date is not None:
+                yield date, ''.join(parts)
+            date, parts = match.group(0), [line[match.end():]]
+        elif date is not None:
+            parts.append(line)
+    if date is not None:
+        yield date, ''.join(parts)
+
+
+def iter_preprocess(source, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8', chat_format=None):
+    """Streaming counterpart of preprocess(): yields DataFrames of at most
+    chunk_size messages so peak memory tracks the chunk, not the file. Join
+    chunks with concat_frames() to get the same frame preprocess() returns."""
+    lines = _iter_lines(source, encoding)
+    if chat_format is None:
+        chat_format, lines = _probe_lines(lines)
+
+    messages, dates = [], []
+    for date, message in _iter_records(lines, chat_format):
+        dates.append(date)
+        messages.append(message)
+        if len(messages) >= chunk_size:
+            yield _build_frame(messages, dates, chat_format)
+            messages, dates = [], []
+    if messages:
+        yield _build_frame(messages, dates, chat_format)
+
+
+def _build_frame(messages, dates, chat_format):
+    rows = len(messages)
     # Create DataFrame
     df = pd.DataFrame({'user_message': messages, 'message_date': dates})
 
     # NEW: Ensure user_message is string type
     df['user_message'] = df['user_message'].astype(str)
 
-    # Replace non-breaking space with a regular space and remove trailing characters
-    df['message_date'] = df['message_date'].str.replace('\u202F', ' ', regex=False).str.rstrip(' - ')
-
-    # Convert message_date type
-    df['message_date'] = pd.to_datetime(df['message_date'], format='%d/%m/%y, %I:%M %p')
+    # Strip the header down to the bare timestamp and parse it with the detected exact format
+    with stage('preprocess.parse_dates', rows):
+        df['message_date'] = (df['message_date'].str.replace('[\u202f\u00a0]', ' ', regex=True)
+                              .str.strip(' -[]\u200e'))
+        df['message_date'] = pd.to_datetime(df['message_date'], format=chat_format.date_format)
 
     # Rename the column
     df.rename(columns={'message_date': 'date'}, inplace=True)
 
-    users = []
-    messages = []
-    for message in df['user_message']:
-        entry = re.split('([\w\W]+?):\s', str(message))  # NEW: Added str() conversion here
-        if entry[1:]:  # user name
-            users.append(entry[1])
-            messages.append(" ".join(entry[2:]))
-        else:
-            users.append('group_notification')
-            messages.append(entry[0])
-
-    df['user'] = users
-    df['message'] = messages
-    df.drop(columns=['user_message'], inplace=True)
-
-    # NEW: Ensure critical columns are strings
-    df['message'] = df['message'].astype(str)
-    df['user'] = df['user'].astype(str)
-
-    df['Specific_Date'] = df['date'].dt.date
+    # Split "user: message" in one vectorized pass; rows without a sender are notifications
+    with stage('preprocess.split_users', rows):
+        parts = df['user_message'].str.extract(USER_MESSAGE_PATTERN)
+        has_user = parts['user'].notna()
+        df['user'] = parts['user'].where(has_user, 'group_notification')
+        df['message'] = parts['message'].where(has_user, df['user_message'])
+        df.drop(columns=['user_message'], inplace=True)
+
+        # NEW: Ensure critical columns are strings
+        df['message'] = df['message'].astype(str)
+        df['user'] = df['user'].astype(str)
+
+    with stage('preprocess.date_parts', rows):
+        df = _add_date_parts(df)
+    return df
+
+
+def _add_date_parts(df):
+    month_num = df['date'].dt.month.to_numpy()
+    weekday = df['date'].dt.dayofweek.to_numpy()
+    hour = df['date'].dt.hour.to_numpy()
+
+    df['Specific_Date'] = df['date'].dt.normalize()
     df['year'] = df['date'].dt.year
-    df['month_num'] = df['date'].dt.month
-    df['month'] = df['date'].dt.month_name()
+    df['month_num'] = month_num
+    df['month'] = pd.Categorical.from_codes(month_num - 1, dtype=MONTH_DTYPE)
     df['day'] = df['date'].dt.day
-    df['day_name'] = df['date'].dt.day_name()
-    df['hour'] = df['date'].dt.hour
+    df['day_name'] = pd.Categorical.from_codes(weekday, dtype=DAY_DTYPE)
+    df['hour'] = hour
     df['minute'] = df['date'].dt.minute
 
-    # NEW: Add try-catch for sentiment analysis
-    try:
-        df['sentiment'] = df['message'].apply(lambda msg: TextBlob(str(msg)).sentiment.polarity)
-        analyzer = SentimentIntensityAnalyzer()
-        df['vader_sentiment'] = df['message'].apply(lambda msg: analyzer.polarity_scores(str(msg))['compound'])
-    except Exception as e:
-        print(f"Sentiment analysis error: {str(e)}")
-        df['sentiment'] = 0
-        df['vader_sentiment'] = 0
-
-    period = []
-    for hour in df[['day_name', 'hour']]['hour']:
-        if hour == 23:
-            period.append(str(hour) + "-" + str('00'))
-        elif hour == 0:
-            period.append(str('00') + "-" + str(hour + 1))
-        else:
-            period.append(str(hour) + "-" + str(hour + 1))
-
-    df['period'] = period
+    # Sentiment columns are added on demand by sentiment.ensure_sentiment()
+    df['period'] = pd.Categorical.from_codes(hour, dtype=PERIOD_DTYPE)
 
+    return enforce_schema(df)
+
+
+def enforce_schema(df):
+    """Casts the frame to SCHEMA in place (columns not present are skipped).
+    Cheap when the dtypes already match."""
+    for col, dtype in SCHEMA.items():
+        if col in df.columns and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
     return df
+
+
+def concat_frames(frames):
+    # Chunks carry their own 'user' categories, so re-unify them after concatenating
+    return enforce_schema(pd.concat(frames, ignore_index=True))
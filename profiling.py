@@ -0,0 +1,78 @@
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('chatfusion.profiling')
+
+# Off unless the diagnostics panel turns it on, or CHATFUSION_PROFILE is set
+# (e.g. to collect the log lines from a headless run)
+ENABLED_BY_DEFAULT = bool(os.environ.get('CHATFUSION_PROFILE'))
+
+# Stands in for a record list where stages are only logged, not kept
+_LOG_ONLY = object()
+
+# Records of the current context: a list while collecting, None when profiling is off. Each
+# Streamlit session (and each batch chat) installs its own with collect(), so sessions served
+# by one process never see or clear each other's records. Threads and processes that were never
+# given one, like the precompute pool, fall back to logging only when CHATFUSION_PROFILE is set.
+_collector = contextvars.ContextVar('chatfusion_profiling', default=_LOG_ONLY if ENABLED_BY_DEFAULT else None)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def collect(enabled=True):
+    """Starts a fresh, empty record list for the current context (call it at
+    the top of each rerun or job), or turns profiling off there when
+    `enabled` is false."""
+    _collector.set([] if enabled else None)
+
+
+def is_enabled():
+    return _collector.get() is not None
+
+
+def records():
+    collector = _collector.get()
+    return list(collector) if isinstance(collector, list) else []
+
+
+def _rss_bytes():
+    # Current resident set size; only available where /proc is (Linux)
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Times the enclosed block as one named stage: wall time, CPU time, rows
+    handled and the change in resident memory. Yields the record so the
+    caller can fill in 'rows' once known. When profiling is disabled this
+    yields None and records nothing."""
+    collector = _collector.get()
+    if collector is None:
+        yield None
+        return
+
+    record = {'stage': name, 'rows': rows}
+    rss_before = _rss_bytes()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - wall, 6)
+        record['cpu_seconds'] = round(time.process_time() - cpu, 6)
+        rss_after = _rss_bytes()
+        record['memory_delta_bytes'] = None if None in (rss_before, rss_after) else rss_after - rss_before
+        if collector is not _LOG_ONLY:
+            collector.append(record)
+        logger.info(json.dumps(record))
+
+
+def to_json():
+    return json.dumps(records(), indent=2)
@@ -0,0 +1,141 @@
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+from textblob import TextBlob
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from cache import DiskLRU, content_key
+from parallel import env_workers, parallel_map
+from profiling import stage
+
+# Default pool size; override per call or with CHATFUSION_SENTIMENT_WORKERS
+DEFAULT_WORKERS = env_workers('CHATFUSION_SENTIMENT_WORKERS', os.cpu_count() or 1)
+BATCH_SIZE = 5_000
+# Fewest distinct messages scored in the pool rather than in-process
+MIN_PARALLEL_MESSAGES = 20_000
+
+# Optional on-disk score store shared across sessions (off unless configured)
+CACHE_PATH = os.environ.get('CHATFUSION_SENTIMENT_CACHE')
+CACHE_MAX_ENTRIES = int(os.environ.get('CHATFUSION_SENTIMENT_CACHE_ENTRIES', 1_000_000))
+
+# (textblob polarity, vader compound) packed as the cached value
+_SCORES = struct.Struct('<dd')
+
+_analyzer = None
+_store = None
+
+
+def configure_store(path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+    # Points the persistent score cache at `path`; None disables it
+    global _store
+    if _store is not None:
+        _store.close()
+    _store = DiskLRU(path, max_entries) if path else None
+    return _store
+
+
+configure_store()
+
+
+def _init_worker():
+    # One VADER analyzer per process, reused for every batch it scores
+    global _analyzer
+    _analyzer = SentimentIntensityAnalyzer()
+
+
+def _score_batch(messages):
+    if _analyzer is None:
+        _init_worker()
+    # Only recorded when scoring runs in this process, not inside pool workers
+    with stage('sentiment.textblob', len(messages)):
+        polarity = [TextBlob(msg).sentiment.polarity for msg in messages]
+    with stage('sentiment.vader', len(messages)):
+        compound = [_analyzer.polarity_scores(msg)['compound'] for msg in messages]
+    return polarity, compound
+
+
+def _score_parallel(messages, workers, batch_size):
+    polarity, compound = [], []
+    for batch_polarity, batch_compound in parallel_map(_score_batch, messages, workers, batch_size,
+                                                       MIN_PARALLEL_MESSAGES, _init_worker):
+        polarity.extend(batch_polarity)
+        compound.extend(batch_compound)
+    return polarity, compound
+
+
+def _score_unique(texts, workers, batch_size, store):
+    polarity = np.zeros(len(texts))
+    compound = np.zeros(len(texts))
+    keys = [content_key(text) for text in texts] if store is not None else None
+
+    missing = range(len(texts))
+    if store is not None:
+        cached = store.get_many(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            if key in cached:
+                polarity[i], compound[i] = _SCORES.unpack(cached[key])
+            else:
+                missing.append(i)
+
+    scored_polarity, scored_compound = _score_parallel([texts[i] for i in missing], workers, batch_size)
+    polarity[list(missing)] = scored_polarity
+    compound[list(missing)] = scored_compound
+
+    if store is not None and missing:
+        store.set_many((keys[i], _SCORES.pack(polarity[i], compound[i])) for i in missing)
+    return polarity, compound
+
+
+def score_messages(messages, workers=None, batch_size=BATCH_SIZE, store=None):
+    """Returns (textblob_polarity, vader_compound) arrays aligned with
+    `messages`. Each distinct (whitespace-normalized) text is scored once and
+    the result broadcast back to every row; scores already in the persistent
+    store are reused, and the rest are scored in batches across a process
+    pool when the input is large."""
+    workers = DEFAULT_WORKERS if workers is None else workers
+    store = _store if store is None else store
+
+    # Leading/trailing whitespace doesn't change either model's score
+    normalized = pd.Series(messages, dtype=object).astype(str).str.strip()
+    codes, uniques = pd.factorize(normalized)
+    polarity, compound = _score_unique(list(uniques), workers, batch_size, store)
+    return polarity[codes], compound[codes]
+
+
+SENTIMENT_COLUMNS = ['sentiment', 'vader_sentiment']
+# Set in df.attrs when scoring failed and the columns only hold neutral placeholders
+_FAILED = 'sentiment_failed'
+
+
+def has_sentiment(df):
+    # Placeholder zeros from a failed scoring run don't count as scores
+    return not df.attrs.get(_FAILED) and all(col in df.columns for col in SENTIMENT_COLUMNS)
+
+
+def ensure_sentiment(df, workers=None):
+    """Scores the frame the first time a sentiment view asks for it. The
+    columns are written onto `df` itself, so later views and reruns that hold
+    the same frame reuse them. After a failed run the next call retries."""
+    if not has_sentiment(df):
+        add_sentiment(df, workers)
+    return df
+
+
+def add_sentiment(df, workers=None):
+    # Fills the 'sentiment' (TextBlob) and 'vader_sentiment' (VADER) columns in place
+    try:
+        with stage('sentiment', len(df)):
+            polarity, compound = score_messages(df['message'], workers)
+        df['sentiment'] = polarity.astype(np.float32)
+        df['vader_sentiment'] = compound.astype(np.float32)
+        df.attrs.pop(_FAILED, None)
+    except Exception as e:
+        print(f"Sentiment analysis error: {str(e)}")
+        # Neutral scores keep the views working, but the frame stays unscored so nothing persists them
+        df['sentiment'] = np.float32(0)
+        df['vader_sentiment'] = np.float32(0)
+        df.attrs[_FAILED] = True
+    return df
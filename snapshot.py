@@ -0,0 +1,63 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Bump whenever the columns or dtypes produced by preprocess() change
+SCHEMA_VERSION = 2
+
+_VERSION_KEY = b'chatfusion.schema_version'
+_SOURCE_KEY = b'chatfusion.source_hash'
+
+# Opt-in directory for reusable snapshots of parsed chats
+SNAPSHOT_DIR = os.environ.get('CHATFUSION_SNAPSHOT_DIR')
+
+
+def snapshot_path(directory, source_hash, fmt='arrow'):
+    return os.path.join(directory, f"{source_hash}.{fmt}")
+
+
+def save_snapshot(df, path, source_hash):
+    """Writes a preprocessed frame to `path` as Arrow IPC (or Parquet when
+    the path ends in .parquet), tagged with SCHEMA_VERSION and the hash of
+    the export it was parsed from."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_VERSION_KEY] = str(SCHEMA_VERSION).encode()
+    metadata[_SOURCE_KEY] = source_hash.encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # Write to a temporary file first so a crash never leaves a truncated snapshot
+    tmp_path = path + '.tmp'
+    if path.endswith('.parquet'):
+        pq.write_table(table, tmp_path)
+    else:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot_table(path):
+    # Arrow IPC files are memory-mapped, so only the touched buffers are paged in
+    if path.endswith('.parquet'):
+        return pq.read_table(path, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def load_snapshot(path, source_hash=None):
+    """Returns the stored frame, or None when the file is missing, was written
+    by another schema version or (if given) for a different source hash."""
+    if not os.path.exists(path):
+        return None
+    try:
+        table = read_snapshot_table(path)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    metadata = table.schema.metadata or {}
+    if metadata.get(_VERSION_KEY) != str(SCHEMA_VERSION).encode():
+        return None
+    if source_hash is not None and metadata.get(_SOURCE_KEY) != source_hash.encode():
+        return None
+    return table.to_pandas()
@@ -0,0 +1,32 @@
+import io
+
+import pandas as pd
+
+import preprocessor
+from benchmarks import synthetic
+from formats import PROBE_SIZE, detect_format
+
+
+def test_month_first_export_settled_past_the_probe():
+    # The first 8 KB only has days 1-12, so both orders parse it; 01/13/21 further on settles it
+    data = synthetic.generate(5000, users=4, chat_format='android_mdy_12h')
+    assert '/13/21' not in data[:PROBE_SIZE]
+    assert detect_format(data[:PROBE_SIZE]).name == 'android_dmy_12h'
+    assert detect_format(data).name == 'android_mdy_12h'
+
+    df = preprocessor.preprocess(data)
+    assert len(df) == 5000
+    assert df['date'].is_monotonic_increasing
+    streamed = preprocessor.concat_frames(list(preprocessor.iter_preprocess(io.StringIO(data), chunk_size=700)))
+    pd.testing.assert_frame_equal(streamed, df)
+
+
+def test_day_first_export_keeps_day_first():
+    data = synthetic.generate(5000, users=4, chat_format='android_dmy_12h')
+    assert detect_format(data).name == 'android_dmy_12h'
+    assert len(preprocessor.preprocess(data)) == 5000
+
+
+def test_ambiguous_export_defaults_to_day_first():
+    data = "01/02/21, 9:15 PM - A: hi\n03/04/21, 9:16 PM - B: hey\n"
+    assert detect_format(data).name == 'android_dmy_12h'
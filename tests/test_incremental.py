@@ -0,0 +1,56 @@
+import pandas as pd
+
+import incremental
+import preprocessor
+import sentiment
+import snapshot
+from benchmarks import synthetic
+from cache import content_key
+
+
+def store(data, directory, score=False):
+    # What main.py does after parsing an upload with snapshots on
+    source_hash = content_key(data)
+    df, checkpoint, mode = incremental.preprocess(data, source_hash, str(directory))
+    if score:
+        sentiment.add_sentiment(df, workers=1)
+    snapshot.save_snapshot(df, snapshot.snapshot_path(str(directory), source_hash), source_hash)
+    incremental.save_checkpoint(checkpoint, str(directory))
+    return df, mode
+
+
+def test_appended_export_matches_full_reparse(tmp_path):
+    full = synthetic.generate(2000, users=5, multiline=0.2)
+    prefix = full[:full.rindex('\n', 0, len(full) * 3 // 4) + 1]
+    _, mode = store(prefix, tmp_path)
+    assert mode == 'full'
+
+    # The re-export continues the last stored message and then adds new ones
+    appended = prefix + "a continuation line of the last stored message\n" + full[len(prefix):]
+    df, _, mode = incremental.preprocess(appended, content_key(appended), str(tmp_path))
+    assert mode == 'incremental'
+    pd.testing.assert_frame_equal(df, preprocessor.preprocess(appended))
+
+
+def test_appended_export_keeps_and_extends_scores(tmp_path):
+    full = synthetic.generate(600, users=4)
+    prefix = full[:full.rindex('\n', 0, len(full) // 2) + 1]
+    store(prefix, tmp_path, score=True)
+
+    df, _, mode = incremental.preprocess(full, content_key(full), str(tmp_path))
+    assert mode == 'incremental'
+    expected = sentiment.add_sentiment(preprocessor.preprocess(full), workers=1)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_changed_prefix_reparses_in_full(tmp_path):
+    full = synthetic.generate(1000, users=4)
+    prefix = full[:len(full) // 2]
+    prefix = prefix[:prefix.rindex('\n') + 1]
+    store(prefix, tmp_path)
+
+    first_line = full.index('\n') + 1
+    edited = full[:first_line] + full[first_line:].replace('User 1', 'User X', 1)
+    df, _, mode = incremental.preprocess(edited, content_key(edited), str(tmp_path))
+    assert mode == 'full'
+    pd.testing.assert_frame_equal(df, preprocessor.preprocess(edited))
@@ -0,0 +1,34 @@
+from urlextract import URLExtract
+
+import links
+
+SAMPLES = [
+    "ip 192.168.1.1",
+    "dns is 1.1.1.1/dns-query",
+    "http://10.0.0.1:80/x",
+    "see example.com",
+    "EXAMPLE.COM in caps",
+    "a.b.co.uk",
+    "https://github.com/x/y?tab=1",
+    "www.youtube.com/watch?v=abc",
+    "xn--80ak6aa92e.com",
+    "_x.com",
+    "münchen.de",
+    "version 1.2.3 is out",
+    "pi is 3.14",
+    "no link here",
+    "<Media omitted>",
+]
+
+
+def test_prefilter_keeps_every_row_urlextract_finds_links_in():
+    extractor = URLExtract()
+    for message in SAMPLES:
+        if extractor.find_urls(message):
+            assert links.CANDIDATE_PATTERN.search(message), message
+
+
+def test_extract_links_matches_urlextract():
+    extractor = URLExtract()
+    expected = sum(len(extractor.find_urls(message)) for message in SAMPLES)
+    assert links.count_links(SAMPLES, workers=1) == expected
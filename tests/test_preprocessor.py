@@ -0,0 +1,37 @@
+import pandas as pd
+
+import preprocessor
+from benchmarks import synthetic
+from formats import FORMATS_BY_NAME
+
+ANDROID = FORMATS_BY_NAME['android_dmy_12h']
+
+
+def multiline_export(messages=300):
+    # Every message runs over several lines, so most cut points land inside one
+    lines = []
+    for i in range(messages):
+        lines.append(f"{i % 28 + 1:02d}/01/21, 9:{i % 60:02d} PM - User {i % 3}: message {i}\n")
+        lines.append(f"continued {i}, quoting 01/01/21, 9:00 PM - User 9: not a header\n")
+        lines.append("and one more line\n")
+    return ''.join(lines)
+
+
+def test_split_points_cut_only_at_message_headers():
+    data = multiline_export()
+    assert len(preprocessor.preprocess(data, ANDROID)) == 300
+    points = preprocessor.split_points(data, ANDROID.pattern, 16)
+    assert len(points) > 2
+    assert points[0] == 0 and points[-1] == len(data)
+    assert points == sorted(set(points))
+    for point in points[1:-1]:
+        assert data[point - 1] == '\n'
+        assert ANDROID.pattern.match(data, point)
+
+
+def test_parallel_parse_matches_serial(monkeypatch):
+    monkeypatch.setattr(preprocessor, 'MIN_PARALLEL_CHARS', 0)
+    for data in [multiline_export(), synthetic.generate(3000, users=5, multiline=0.3)]:
+        serial = preprocessor.preprocess(data, ANDROID, workers=1)
+        parallel = preprocessor.preprocess(data, ANDROID, workers=3)
+        pd.testing.assert_frame_equal(parallel, serial)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+SENTIMENT_COLUMNS = ['sentiment', 'vader_sentiment']
+
+# Candidate bin widths, finest first; the first one giving at most MAX_BINS bins wins
+INTERVALS = [('H', pd.Timedelta(hours=1)), ('D', pd.Timedelta(days=1)), ('W', pd.Timedelta(weeks=1)),
+             ('M', pd.Timedelta(days=30))]
+MAX_BINS = 400
+
+# Raw points drawn per chart; render cost is bounded by this, not the message count
+DEFAULT_POINT_BUDGET = 2_000
+
+
+def adaptive_freq(start, end, max_bins=MAX_BINS):
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for freq, width in INTERVALS:
+        if span / width <= max_bins:
+            return freq
+    return INTERVALS[-1][0]
+
+
+def aggregate_sentiment(frame, freq=None, rolling=None):
+    """Bins the sentiment columns of `frame` by `freq` (chosen from the chat's
+    time span when None) and returns per-bin count, mean, 25th/75th
+    percentiles and, if `rolling` is given, a rolling mean over that many
+    bins. Empty bins are dropped."""
+    if frame.empty:
+        return pd.DataFrame()
+    if freq is None:
+        freq = adaptive_freq(frame['date'].min(), frame['date'].max())
+
+    grouped = frame.groupby(pd.Grouper(key='date', freq=freq))
+    result = pd.DataFrame({'count': grouped.size()})
+    for col in SENTIMENT_COLUMNS:
+        result[f'{col}_mean'] = grouped[col].mean()
+        result[f'{col}_p25'] = grouped[col].quantile(0.25)
+        result[f'{col}_p75'] = grouped[col].quantile(0.75)
+
+    result = result[result['count'] > 0]
+    if rolling:
+        for col in SENTIMENT_COLUMNS:
+            result[f'{col}_rolling'] = result[f'{col}_mean'].rolling(rolling, min_periods=1).mean()
+    result.attrs['freq'] = freq
+    return result
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling. Returns the indices of
+    the n_out points of (x, y) that best preserve the visual shape; the first
+    and last points are always kept. x must be sorted and numeric."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # n_out - 2 buckets between the fixed end points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the triangle's third vertex
+        if i + 2 < len(edges):
+            next_x = x[stop:edges[i + 2]].mean()
+            next_y = y[stop:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(frame, column, budget=DEFAULT_POINT_BUDGET):
+    # Raw (date, score) points of `column` reduced to at most `budget` with LTTB
+    if frame.empty:
+        return frame[['date', column]]
+    keep = lttb(frame['date'].to_numpy().astype(np.int64), frame[column].to_numpy(), budget)
+    return frame[['date', column]].iloc[keep]